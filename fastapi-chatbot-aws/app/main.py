@@ -1,4 +1,10 @@
-from fastapi import FastAPI, HTTPException
+import os
+import threading
+from typing import Optional
+
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 app = FastAPI(title="Chatbot API")
@@ -9,8 +15,54 @@ class Message(BaseModel):
 class ChatResponse(BaseModel):
     response: str
 
+class HistoryStore:
+    """
+    Fixed-capacity ring buffer for chat messages.
+
+    Every message gets a monotonically increasing id. Once the buffer is full the
+    oldest message is overwritten, so memory stays bounded by `capacity` and a page
+    read only touches the slots it returns.
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._next_id, self.capacity)
+
+    @property
+    def version(self) -> int:
+        # Bumped by every append, so it identifies the current contents of any page
+        return self._next_id
+
+    def append(self, content: str) -> int:
+        with self._lock:
+            message_id = self._next_id
+            self._slots[message_id % self.capacity] = content
+            self._next_id += 1
+            return message_id
+
+    def page(self, limit: int, before: Optional[int] = None):
+        """
+        Return up to `limit` messages older than `before` (newest page if None), oldest first,
+        plus the cursor for the next older page (None when there is nothing older).
+        """
+        with self._lock:
+            oldest = max(0, self._next_id - self.capacity)
+            end = self._next_id if before is None else min(before, self._next_id)
+            start = max(oldest, end - limit)
+            items = [self._slots[i % self.capacity] for i in range(start, end)]
+        next_before = start if start > oldest else None
+        return items, next_before
+
 # In-memory message history (replace with database in later modules)
-conversation_history = []
+HISTORY_CAPACITY = int(os.getenv("HISTORY_CAPACITY", "1000"))
+conversation_history = HistoryStore(HISTORY_CAPACITY)
 
 @app.get("/")
 def read_root():
@@ -20,12 +72,53 @@ def read_root():
 def chat(message: Message):
     # Store message in history
     conversation_history.append(message.content)
-    
+
     # Simple echo response for now
     response = f"You said: {message.content}"
-    
+
     return ChatResponse(response=response)
 
-@app.get("/history")
-def get_history():
-    return {"history": conversation_history}
\ No newline at end of file
+def reply_tokens(content: str):
+    # Simple echo response split into words, standing in for a model that streams tokens
+    words = f"You said: {content}".split(" ")
+    yield words[0]
+    for word in words[1:]:
+        yield " " + word
+
+def sse_event(data, event: Optional[str] = None) -> bytes:
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+@app.post("/chat/stream")
+def chat_stream(message: Message):
+    # Server-Sent Events: one `data` event per token, then a `done` event with the full reply
+    def events():
+        tokens = []
+        for token in reply_tokens(message.content):
+            tokens.append(token)
+            yield sse_event({"token": token})
+        # Store the message once the reply is complete
+        conversation_history.append(message.content)
+        yield sse_event({"response": "".join(tokens)}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/history", response_class=ORJSONResponse)
+def get_history(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = Query(None, ge=0),
+):
+    # Polling clients send the ETag back in If-None-Match and get a 304 until /chat adds a message
+    etag = f'"v{conversation_history.version}-{limit}-{before}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    # Pass `next_before` back as `before` to fetch the previous page
+    history, next_before = conversation_history.page(limit, before)
+    return ORJSONResponse({"history": history, "next_before": next_before}, headers=headers)
@@ -0,0 +1,158 @@
+"""
+Chatbot apps under benchmark and how to load or serve them.
+
+Scenarios:
+    inmemory         fastapi-chatbot-aws/app/main.py (ring buffer history)
+    sessions         pulumi-project-1/fastapi-app (SESSION_BACKEND=memory)
+    sessions-sqlite  pulumi-project-1/fastapi-app (SESSION_BACKEND=sqlite, WAL file)
+    rds              the app written by infrastructure/user_data.sh, on SQLite instead of Postgres
+"""
+import importlib.util
+import logging
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict
+
+import httpx
+
+CHATBOT_DIR = Path(__file__).resolve().parent.parent
+REPO_DIR = CHATBOT_DIR.parent
+USER_DATA = CHATBOT_DIR / "infrastructure" / "user_data.sh"
+USER_DATA_MODULES = (
+    "main.py", "logging_config.py", "write_behind.py", "metrics.py", "partitions.py", "archive.py", "db_routing.py",
+    "config_client.py",
+)
+
+
+@dataclass
+class Workload:
+    method: str
+    # Builds (path, json body) for the i-th request
+    request: Callable[[int], tuple]
+
+
+@dataclass
+class Scenario:
+    name: str
+    app_dir: Path
+    module_path: str  # file path relative to app_dir
+    target: str  # uvicorn/gunicorn "module:attr", importable from app_dir
+    env: Dict[str, str] = field(default_factory=dict)
+    workloads: Dict[str, Workload] = field(default_factory=dict)
+
+
+def extract_user_data_app(dest: Path):
+    """Write the Python modules embedded as heredocs in user_data.sh into `dest`."""
+    script = USER_DATA.read_text()
+    for name in USER_DATA_MODULES:
+        match = re.search(
+            r"cat << ?'EOF' > /opt/chatbot/" + re.escape(name) + r"\n(.*?)\nEOF\n", script, re.S
+        )
+        if match is None:
+            raise RuntimeError(f"{name} not found in {USER_DATA}")
+        (dest / name).write_text(match.group(1) + "\n")
+
+
+def scenarios(workdir: Path) -> Dict[str, Scenario]:
+    rds_dir = workdir / "rds"
+    rds_dir.mkdir(parents=True, exist_ok=True)
+    extract_user_data_app(rds_dir)
+    sessions_dir = REPO_DIR / "pulumi-project-1" / "fastapi-app"
+
+    def chat_content(i):
+        return "/chat", {"content": f"benchmark message {i}"}
+
+    def session_chat(i):
+        return "/chat", {"message": f"benchmark message {i}", "session_id": f"bench_{i % 100}"}
+
+    def session_history(i):
+        return f"/history/bench_{i % 100}", None
+
+    session_workloads = {
+        "chat": Workload("POST", session_chat),
+        "history": Workload("GET", session_history),
+    }
+    return {
+        "inmemory": Scenario(
+            "inmemory", CHATBOT_DIR / "app", "main.py", "main:app",
+            workloads={
+                "chat": Workload("POST", chat_content),
+                "history": Workload("GET", lambda i: ("/history?limit=50", None)),
+            },
+        ),
+        "sessions": Scenario(
+            "sessions", sessions_dir, "app/main.py", "app.main:app",
+            env={"SESSION_BACKEND": "memory"},
+            workloads=session_workloads,
+        ),
+        "sessions-sqlite": Scenario(
+            "sessions-sqlite", sessions_dir, "app/main.py", "app.main:app",
+            env={"SESSION_BACKEND": "sqlite", "SESSION_SQLITE_PATH": str(workdir / "sessions.db")},
+            workloads=session_workloads,
+        ),
+        "rds": Scenario(
+            "rds", rds_dir, "main.py", "main:app",
+            env={
+                "DATABASE_URL": f"sqlite:///{workdir / 'chatbot.db'}",
+                "LOG_FILE": str(workdir / "chatbot.log"),
+            },
+            workloads={
+                "chat": Workload("POST", chat_content),
+                "history": Workload("GET", lambda i: ("/history?limit=100", None)),
+            },
+        ),
+    }
+
+
+def load_app(scenario: Scenario):
+    """Import the scenario's ASGI app into this process under a unique module name."""
+    os.environ.update(scenario.env)
+    if str(scenario.app_dir) not in sys.path:
+        sys.path.insert(0, str(scenario.app_dir))
+    module_name = "bench_" + scenario.name.replace("-", "_")
+    spec = importlib.util.spec_from_file_location(module_name, scenario.app_dir / scenario.module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    # Keep request logs in the log file only, not interleaved with the report
+    chatbot_logger = logging.getLogger("chatbot")
+    for handler in list(chatbot_logger.handlers):
+        if type(handler) is logging.StreamHandler:
+            chatbot_logger.removeHandler(handler)
+    return module.app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(scenario: Scenario, server: str, workers: int, port: int, log_path: Path, timeout: float = 30.0):
+    """Serve the scenario on 127.0.0.1:port with uvicorn or gunicorn and wait until it answers."""
+    if server == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "uvicorn.workers.UvicornWorker",
+               scenario.target, "-b", f"127.0.0.1:{port}", "--log-level", "warning"]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", scenario.target, "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    env = {**os.environ, **scenario.env}
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(cmd, cwd=scenario.app_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{server} exited early:\n{log_path.read_text()}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1.0).status_code == 200:
+                return process
+        except httpx.TransportError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{server} did not start within {timeout}s")
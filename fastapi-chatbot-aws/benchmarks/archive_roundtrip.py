@@ -0,0 +1,128 @@
+"""
+Round trip for the message archive job (archive.py in infrastructure/user_data.sh).
+
+Seeds a SQLite messages table spread over several days, archives everything older
+than the cutoff into a moto-mocked S3 bucket, then reads the objects back and checks
+that every archived row is in S3 exactly once and gone from the table, while newer
+rows are untouched and messages_version (the /history ETag's removal counter) was
+bumped. Reports rows/s and the peak Python memory of the archive run,
+which should stay flat as --messages grows.
+
+Run from the fastapi-chatbot-aws directory:
+
+    python -m benchmarks.archive_roundtrip
+    python -m benchmarks.archive_roundtrip --messages 500000 --format parquet
+"""
+import argparse
+import io
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import boto3
+import orjson
+from moto import mock_aws
+from sqlalchemy import create_engine, func, insert, select
+
+from benchmarks.apps import extract_user_data_app
+
+BUCKET = "chatbot-archive-bench"
+
+
+def seed(engine, archive, count, days):
+    archive.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    step = timedelta(days=days) / count
+    with engine.begin() as conn:
+        for offset in range(0, count, 10000):
+            conn.execute(insert(archive.messages), [
+                {"content": f"message {i}", "response": f"You said: message {i}", "created_at": start + step * i}
+                for i in range(offset, min(offset + 10000, count))
+            ])
+    return start
+
+
+def read_back(s3, fmt):
+    ids = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET):
+        for obj in page.get("Contents", []):
+            body = s3.get_object(Bucket=BUCKET, Key=obj["Key"])["Body"].read()
+            if fmt == "parquet":
+                import pyarrow.parquet as pq
+
+                ids.extend(pq.read_table(io.BytesIO(body)).column("id").to_pylist())
+            else:
+                import zstandard
+
+                lines = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)).read().splitlines()
+                ids.extend(orjson.loads(line)["id"] for line in lines)
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=10)
+    parser.add_argument("--archive-days", type=int, default=7, help="days before the cutoff")
+    parser.add_argument("--format", choices=("ndjson", "parquet"), default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="archive-bench-") as tmp:
+        extract_user_data_app(Path(tmp))
+        sys.path.insert(0, tmp)
+        import archive
+        import partitions
+
+        engine = create_engine(f"sqlite:///{tmp}/chatbot.db")
+        start = seed(engine, archive, args.messages, args.days)
+        cutoff = start + timedelta(days=args.archive_days)
+        with engine.connect() as conn:
+            expected = conn.execute(
+                select(func.count()).where(archive.messages.c.created_at < cutoff)
+            ).scalar()
+
+        with mock_aws():
+            s3 = boto3.client("s3", region_name="eu-west-2")
+            s3.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "eu-west-2"})
+
+            tracemalloc.start()
+            began = time.perf_counter()
+            objects = archive.archive_messages(engine, s3, BUCKET, cutoff, fmt=args.format, batch_size=args.batch_size)
+            elapsed = time.perf_counter() - began
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            archived_ids = read_back(s3, args.format)
+
+        with engine.connect() as conn:
+            remaining_old = conn.execute(
+                select(func.count()).where(archive.messages.c.created_at < cutoff)
+            ).scalar()
+            remaining = conn.execute(select(func.count()).select_from(archive.messages)).scalar()
+            version = conn.execute(select(partitions.messages_version.c.version)).scalar()
+        engine.dispose()
+
+    print(f"archived {len(archived_ids)} of {args.messages} messages into {len(objects)} objects "
+          f"in {elapsed:.2f}s ({len(archived_ids) / elapsed:.0f} rows/s), peak memory {peak / 2**20:.1f} MiB")
+    failures = []
+    if len(archived_ids) != expected or len(set(archived_ids)) != expected:
+        failures.append(f"expected {expected} unique archived rows, found {len(archived_ids)}")
+    if remaining_old:
+        failures.append(f"{remaining_old} archived rows are still in the table")
+    if remaining != args.messages - expected:
+        failures.append(f"{args.messages - expected - remaining} rows newer than the cutoff were deleted")
+    if expected and not version:
+        failures.append("messages_version was not bumped, so /history ETags would not change")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Check the refresh-ahead config client (config_client.py in infrastructure/user_data.sh).
+
+Against moto-mocked SSM and Secrets Manager, the script checks that:
+- the client reads a parameter path spread over several GetParametersByPath pages;
+- reads between refreshes are served from memory;
+- the background thread reloads before the TTL expires, so no read reloads inline;
+- a changed value replaces the pool of a bound SQLAlchemy engine, and new connections use it.
+  The engine is SQLite, and the changed value is its database file;
+- a failing reload keeps the last known values.
+
+Exits with status 1 on the first failed check.
+
+Run from the fastapi-chatbot-aws directory:
+
+    python -m benchmarks.config_refresh
+"""
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import boto3
+from moto import mock_aws
+from sqlalchemy import create_engine, event, text
+
+from benchmarks.apps import extract_user_data_app
+
+PARAM_PATH = "/chatbot/db"
+
+
+class RecordingSource:
+    """Wraps a source and records which thread each load ran on."""
+
+    def __init__(self, source):
+        self.source = source
+        self.threads = []
+        self.fail = False
+
+    def load(self):
+        self.threads.append(threading.current_thread().name)
+        if self.fail:
+            raise RuntimeError("SSM unavailable")
+        return self.source.load()
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"ok   {message}")
+
+
+def current_database(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA database_list")).fetchone()[2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ttl", type=float, default=1.0)
+    parser.add_argument("--refresh-ahead", type=float, default=0.5)
+    parser.add_argument("--extra-params", type=int, default=25, help="filler parameters, to span several pages")
+    parser.add_argument("--reads", type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="config-refresh-") as tmp, mock_aws():
+        extract_user_data_app(Path(tmp))
+        sys.path.insert(0, tmp)
+        import config_client
+
+        first, second = str(Path(tmp, "first.db")), str(Path(tmp, "second.db"))
+        ssm = boto3.client("ssm", region_name="eu-west-2")
+        pages = []
+        ssm.meta.events.register("after-call.ssm.GetParametersByPath", lambda **kwargs: pages.append(1))
+        ssm.put_parameter(Name=f"{PARAM_PATH}/dbname", Value=first, Type="SecureString")
+        ssm.put_parameter(Name=f"{PARAM_PATH}/password", Value="initial", Type="SecureString")
+        for index in range(args.extra_params):
+            ssm.put_parameter(Name=f"{PARAM_PATH}/extra_{index}", Value=str(index), Type="SecureString")
+
+        source = RecordingSource(config_client.SsmParameterSource(ssm, PARAM_PATH))
+        config = config_client.ConfigClient(source, ttl=args.ttl, refresh_ahead=args.refresh_ahead)
+        changes = []
+        config.on_change(lambda old, new: changes.append(new))
+
+        values = config.values()
+        check(len(values) == args.extra_params + 2 and values["password"] == "initial",
+              f"loaded {len(values)} parameters from {len(pages)} GetParametersByPath pages")
+
+        start = time.perf_counter()
+        for _ in range(args.reads):
+            config.get("password")
+        elapsed = time.perf_counter() - start
+        check(len(source.threads) == 1,
+              f"{args.reads} cached reads took {elapsed / args.reads * 1e6:.2f} us each without reloading")
+
+        engine = create_engine(f"sqlite:///{first}")
+
+        # psycopg2 gets every connect() argument by keyword, but pysqlite gets the file name
+        # positionally; pass it by keyword too so bind_engine can override it
+        @event.listens_for(engine, "do_connect")
+        def file_name_by_keyword(dialect, conn_rec, cargs, cparams):
+            cparams["database"] = cargs.pop(0)
+
+        config_client.bind_engine(engine, config, {"database": "dbname"})
+        check(current_database(engine) == first, "bound engine connects with the loaded value")
+        old_pool = engine.pool
+
+        config.start()
+        ssm.put_parameter(Name=f"{PARAM_PATH}/dbname", Value=second, Type="SecureString", Overwrite=True)
+        changed_at = time.monotonic()
+        # Keep reading while the value changes; every read must come from memory
+        deadline = changed_at + args.ttl * 3
+        while not changes and time.monotonic() < deadline:
+            config.get("dbname")
+            time.sleep(0.01)
+        check(bool(changes), f"background refresh saw the change after {time.monotonic() - changed_at:.2f}s")
+        check(all(name == "config-refresh" for name in source.threads[1:]),
+              f"all {len(source.threads) - 1} reloads ran on the refresh thread, none inline")
+        check(engine.pool is not old_pool and current_database(engine) == second,
+              "engine pool was replaced and new connections use the new value")
+
+        source.fail = True
+        failures_before = len(source.threads)
+        time.sleep(args.ttl * 2)
+        check(len(source.threads) > failures_before and config.get("dbname") == second,
+              "failed reloads are retried and keep the last known values")
+        config.stop()
+        engine.dispose()
+
+        secrets = boto3.client("secretsmanager", region_name="eu-west-2")
+        secrets.create_secret(Name="chatbot-db-credentials", SecretString=json.dumps({"username": "dbadmin"}))
+        secret_config = config_client.ConfigClient(
+            config_client.SecretsManagerSource(secrets, "chatbot-db-credentials"), ttl=args.ttl
+        )
+        check(secret_config.get("username") == "dbadmin", "Secrets Manager source reads the JSON secret")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Offline evaluation of the chatbot Pulumi program (infrastructure/__main__.py) under mocks.
+
+Each branch runs in its own process with pulumi.runtime.set_mocks. The branches are the single
+instance, auto scaling with target tracking, and auto scaling with the step policies. The script
+needs neither AWS credentials nor the Pulumi CLI.
+For each branch the script:
+- counts the resources registered per type and the provider functions invoked;
+- checks the dependencies the program relies on (e.g. the instance or launch template
+  waits for every /chatbot/db SSM parameter and the bootstrap policy);
+- times the program evaluation.
+Counts are compared with benchmarks/pulumi_baseline.json, so growth of the stack shows up as
+a reviewed baseline change.
+
+Run from the fastapi-chatbot-aws directory:
+
+    python -m benchmarks.pulumi_graph
+    python -m benchmarks.pulumi_graph --config dbReplicaCount=1 --config dbConnectionPooler=rds_proxy
+    python -m benchmarks.pulumi_graph --save-baseline           # record benchmarks/pulumi_baseline.json
+    python -m benchmarks.pulumi_graph --check                   # exit 1 on graph changes or slower evaluation
+"""
+import argparse
+import asyncio
+import json
+import os
+import runpy
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from benchmarks.apps import CHATBOT_DIR
+
+INFRASTRUCTURE_DIR = CHATBOT_DIR / "infrastructure"
+BASELINE = Path(__file__).resolve().parent / "pulumi_baseline.json"
+PROJECT = "infrastructure"
+REGION = "eu-west-2"
+ACCOUNT = "123456789012"
+
+BRANCHES = {
+    "single": {
+        "config": {"autoScaling": "false"},
+        "present": ["aws:ec2/instance:Instance"],
+        "absent": ["aws:autoscaling/group:Group", "aws:lb/loadBalancer:LoadBalancer"],
+    },
+    "asg": {
+        "config": {"autoScaling": "true"},
+        "present": ["aws:autoscaling/group:Group", "aws:ec2/launchTemplate:LaunchTemplate", "aws:lb/loadBalancer:LoadBalancer"],
+        "absent": ["aws:ec2/instance:Instance"],
+    },
+    "asg_step": {
+        "config": {"autoScaling": "true", "scalingMode": "step"},
+        "present": ["aws:autoscaling/group:Group", "aws:autoscaling/policy:Policy", "aws:cloudwatch/metricAlarm:MetricAlarm"],
+        "absent": ["aws:ec2/instance:Instance"],
+    },
+}
+
+# (dependent type, dependency type, dependency name prefix): every registered resource of the
+# dependent type must depend on every resource of the dependency type whose name has the prefix
+REQUIRED_DEPENDENCIES = [
+    ("aws:ec2/instance:Instance", "aws:ssm/parameter:Parameter", "db-"),
+    ("aws:ec2/instance:Instance", "aws:iam/rolePolicyAttachment:RolePolicyAttachment", "bootstrap-"),
+    ("aws:ec2/launchTemplate:LaunchTemplate", "aws:ssm/parameter:Parameter", "db-"),
+    ("aws:ec2/launchTemplate:LaunchTemplate", "aws:iam/rolePolicyAttachment:RolePolicyAttachment", "bootstrap-"),
+    ("aws:autoscaling/group:Group", "aws:ec2/launchTemplate:LaunchTemplate", ""),
+    ("aws:autoscaling/group:Group", "aws:ssm/parameter:Parameter", "db-"),
+    ("aws:rds/proxyTarget:ProxyTarget", "aws:rds/proxy:Proxy", ""),
+]
+
+# Output properties the program reads, per resource type (inputs are echoed back as outputs)
+MOCK_OUTPUTS = {
+    "aws:rds/instance:Instance": lambda name: {
+        "address": f"{name}.mock.{REGION}.rds.amazonaws.com",
+        "endpoint": f"{name}.mock.{REGION}.rds.amazonaws.com:5432",
+        "port": 5432,
+        "identifier": name,
+        "username": "dbadmin",
+    },
+    "aws:rds/proxy:Proxy": lambda name: {"endpoint": f"{name}.proxy-mock.{REGION}.rds.amazonaws.com"},
+    "aws:s3/bucketV2:BucketV2": lambda name: {"bucket": f"{name}-mock"},
+    "aws:ec2/instance:Instance": lambda name: {"publicIp": "203.0.113.10", "publicDns": f"{name}.compute.amazonaws.com"},
+    "aws:lb/loadBalancer:LoadBalancer": lambda name: {"dnsName": f"{name}.elb.amazonaws.com", "arnSuffix": f"app/{name}/mock"},
+    "aws:lb/targetGroup:TargetGroup": lambda name: {"arnSuffix": f"targetgroup/{name}/mock"},
+    "aws:autoscaling/group:Group": lambda name: {"name": name},
+}
+
+MOCK_INVOKES = {
+    "aws:ec2/getAmi:getAmi": {"id": "ami-0123456789abcdef0"},
+    "aws:ec2/getAmiIds:getAmiIds": {"ids": ["ami-0123456789abcdef0"]},
+    "aws:index/getAvailabilityZones:getAvailabilityZones": {
+        "names": [f"{REGION}a", f"{REGION}b", f"{REGION}c"], "zoneIds": ["euw2-az1", "euw2-az2", "euw2-az3"],
+    },
+    "aws:index/getRegion:getRegion": {"name": REGION, "region": REGION},
+    "aws:index/getCallerIdentity:getCallerIdentity": {"accountId": ACCOUNT},
+}
+
+
+def evaluate(branch, overrides):
+    """Run the program once under mocks in this process and describe what it registered."""
+    import pulumi
+    from pulumi.runtime.mocks import MockMonitor
+    from pulumi.runtime.stack import wait_for_rpcs
+
+    class ChatbotMocks(pulumi.runtime.Mocks):
+        def __init__(self):
+            self.invokes = Counter()
+
+        def new_resource(self, args):
+            state = {"arn": f"arn:aws:mock:{REGION}:{ACCOUNT}:{args.name}", **args.inputs}
+            for key, value in MOCK_OUTPUTS.get(args.typ, lambda name: {})(args.name).items():
+                state.setdefault(key, value)
+            return [f"{args.name}-id", state]
+
+        def call(self, args):
+            self.invokes[args.token] += 1
+            return MOCK_INVOKES.get(args.token, {})
+
+    class GraphMonitor(MockMonitor):
+        """Records every registration with the URNs it depends on."""
+
+        def __init__(self, mocks):
+            super().__init__(mocks)
+            self.registrations = []
+
+        def RegisterResource(self, request):
+            response = super().RegisterResource(request)
+            if request.type != "pulumi:pulumi:Stack":
+                self.registrations.append({
+                    "urn": response.urn, "type": request.type, "name": request.name,
+                    "dependencies": set(request.dependencies),
+                })
+            return response
+
+    config = {**BRANCHES[branch]["config"], **overrides}
+    os.environ["PULUMI_CONFIG"] = json.dumps({
+        "aws:region": REGION,
+        "ami:lockfile": "",  # never read or write the real lockfile
+        **{key if ":" in key else f"{PROJECT}:{key}": value for key, value in config.items()},
+    })
+    mocks = ChatbotMocks()
+    monitor = GraphMonitor(mocks)
+    pulumi.runtime.set_mocks(mocks, project=PROJECT, stack="graph", preview=True, monitor=monitor)
+
+    os.chdir(INFRASTRUCTURE_DIR)
+    sys.path.insert(0, str(INFRASTRUCTURE_DIR))
+    start = time.perf_counter()
+    runpy.run_path(str(INFRASTRUCTURE_DIR / "__main__.py"), run_name="__main__")
+    asyncio.get_event_loop().run_until_complete(wait_for_rpcs())
+    eval_ms = (time.perf_counter() - start) * 1000
+
+    registrations = monitor.registrations
+    types = Counter(r["type"] for r in registrations)
+    failures = []
+    for resource_type in BRANCHES[branch]["present"]:
+        if not types[resource_type]:
+            failures.append(f"no {resource_type} registered")
+    for resource_type in BRANCHES[branch]["absent"]:
+        if types[resource_type]:
+            failures.append(f"{types[resource_type]} unexpected {resource_type} registered")
+    for dependent_type, dependency_type, prefix in REQUIRED_DEPENDENCIES:
+        required = {r["urn"]: r["name"] for r in registrations if r["type"] == dependency_type and r["name"].startswith(prefix)}
+        for dependent in (r for r in registrations if r["type"] == dependent_type):
+            missing = sorted(name for urn, name in required.items() if urn not in dependent["dependencies"])
+            if missing:
+                failures.append(f"{dependent['name']} does not depend on {', '.join(missing)}")
+    return {
+        "resources": len(registrations),
+        "types": dict(sorted(types.items())),
+        "invokes": dict(sorted(mocks.invokes.items())),
+        "edges": sum(len(r["dependencies"]) for r in registrations),
+        "eval_ms": round(eval_ms, 1),
+        "failures": failures,
+    }
+
+
+def run_branch(branch, overrides):
+    # A fresh interpreter per branch: the program keeps module-level state and the Pulumi runtime is global
+    command = [sys.executable, "-m", "benchmarks.pulumi_graph", "--child", branch]
+    for key, value in overrides.items():
+        command += ["--config", f"{key}={value}"]
+    result = subprocess.run(command, cwd=CHATBOT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{branch} evaluation failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for key, current in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        for resource_type in sorted(set(current["types"]) | set(expected["types"])):
+            now, then = current["types"].get(resource_type, 0), expected["types"].get(resource_type, 0)
+            if now != then:
+                failures.append(f"{key}: {resource_type} {then} -> {now}")
+        if current["invokes"] != expected["invokes"]:
+            failures.append(f"{key}: invokes {expected['invokes']} -> {current['invokes']}")
+        if current["eval_ms"] > expected["eval_ms"] * (1 + tolerance):
+            failures.append(f"{key}: evaluation {current['eval_ms']:.0f} ms > baseline {expected['eval_ms']:.0f} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--branch", action="append", choices=sorted(BRANCHES), help="branch to run (repeatable, default: all)")
+    parser.add_argument("--config", action="append", default=[], metavar="KEY=VALUE", help="extra stack config")
+    parser.add_argument("--runs", type=int, default=3, help="evaluations per branch; the fastest is reported")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed evaluation time regression as a fraction")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if the graph changed or evaluation got slower")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    overrides = dict(item.split("=", 1) for item in args.config)
+
+    if args.child:
+        print(json.dumps(evaluate(args.child, overrides)))
+        return
+
+    results = {}
+    for branch in args.branch or sorted(BRANCHES):
+        runs = [run_branch(branch, overrides) for _ in range(args.runs)]
+        key = branch + "".join(f"+{k}={v}" for k, v in sorted(overrides.items()))
+        results[key] = min(runs, key=lambda run: run["eval_ms"])
+
+    print(f"{'branch':<40} {'resources':>9} {'edges':>6} {'invokes':>8} {'eval ms':>8}")
+    for key, result in results.items():
+        print(f"{key:<40} {result['resources']:9d} {result['edges']:6d} "
+              f"{sum(result['invokes'].values()):8d} {result['eval_ms']:8.1f}")
+    failures = [f"{key}: {failure}" for key, result in results.items() for failure in result["failures"]]
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    if args.save_baseline:
+        baseline.update({key: {k: v for k, v in result.items() if k != "failures"} for key, result in results.items()})
+        BASELINE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"baseline written to {BASELINE}")
+    elif args.check:
+        failures += compare(results, baseline, args.tolerance)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Load and latency benchmark for the chatbot apps.
+
+Each scenario (see apps.py) runs a "chat" workload (POST /chat) and then a "history"
+workload (GET history) with a fixed number of requests and concurrent clients.
+The app is driven in-process through httpx's ASGI transport (--mode asgi) or over a
+real socket served by uvicorn or gunicorn (--mode socket). The report gives
+requests/s and p50/p95/p99 latency.
+
+Run from the fastapi-chatbot-aws directory:
+
+    python -m benchmarks.run                                  # all scenarios, in-process
+    python -m benchmarks.run --mode socket --server gunicorn --workers 4
+    python -m benchmarks.run --save-baseline                  # record benchmarks/baseline.json
+    python -m benchmarks.run --check                          # exit 1 on regression past baseline
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.apps import free_port, load_app, scenarios, start_server
+
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+async def drive(client: httpx.AsyncClient, workload, requests: int, concurrency: int):
+    latencies = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def client_loop():
+        nonlocal errors
+        # All loops share one iterator, so each request index is sent exactly once
+        for i in pending:
+            path, body = workload.request(i)
+            start = time.perf_counter()
+            response = await client.request(workload.method, path, json=body)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    cuts = statistics.quantiles(latencies, n=100)
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "errors": errors,
+    }
+
+
+async def run_scenario(scenario, args, workdir: Path):
+    if args.mode == "asgi":
+        transport = httpx.ASGITransport(app=load_app(scenario))
+        base_url, process = "http://bench", None
+    else:
+        port = free_port()
+        process = start_server(scenario, args.server, args.workers, port, workdir / f"{scenario.name}-server.log")
+        transport, base_url = None, f"http://127.0.0.1:{port}"
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    results = {}
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=30.0) as client:
+            for name, workload in scenario.workloads.items():
+                # Warm-up requests are not measured
+                await drive(client, workload, min(args.requests, 50), args.concurrency)
+                results[name] = await drive(client, workload, args.requests, args.concurrency)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+    return results
+
+
+def check_regressions(results, baseline, tolerance):
+    failures = []
+    for key, current in results.items():
+        expected = baseline.get(key)
+        if expected is None:
+            continue
+        if current["rps"] < expected["rps"] * (1 - tolerance):
+            failures.append(f"{key}: {current['rps']:.0f} req/s < baseline {expected['rps']:.0f} req/s")
+        for metric in ("p95_ms", "p99_ms"):
+            if current[metric] > expected[metric] * (1 + tolerance):
+                failures.append(f"{key}: {metric} {current[metric]:.2f} > baseline {expected[metric]:.2f}")
+        if current["errors"]:
+            failures.append(f"{key}: {current['errors']} error responses")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenario", action="append", help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--mode", choices=("asgi", "socket"), default="asgi")
+    parser.add_argument("--server", choices=("uvicorn", "gunicorn"), default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression as a fraction")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="fail if results regress past the baseline")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="chatbot-bench-") as tmp:
+        available = scenarios(Path(tmp))
+        for name in args.scenario or list(available):
+            for workload, stats in asyncio.run(run_scenario(available[name], args, Path(tmp))).items():
+                results[f"{args.mode}:{name}:{workload}"] = stats
+
+    print(f"{'benchmark':<32} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for key, stats in results.items():
+        print(f"{key:<32} {stats['rps']:9.0f} {stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} "
+              f"{stats['p99_ms']:8.2f} {stats['errors']:7d}")
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    if args.save_baseline:
+        baseline.update({key: {k: round(v, 2) for k, v in stats.items()} for key, stats in results.items()})
+        BASELINE.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"baseline written to {BASELINE}")
+    if args.check:
+        failures = check_regressions(results, baseline, args.tolerance)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Check that the subnet layout of pulumi_shared/vpc.py stays put when AZs are added.
+
+Builds the VPC under Pulumi mocks for 2, 3 and 4 availability zones and checks that:
+- the subnets of AZs a and b keep their CIDR blocks (10.0.1-4.0/24) as azCount grows;
+- every subnet of a layout has its own block, inside the VPC's block.
+A subnet whose CIDR changes is replaced, and the replacement fails while another subnet still
+holds the block, so a moved subnet would break `pulumi up` on a deployed stack.
+
+Exits with status 1 on the first failed check.
+
+Run from the fastapi-chatbot-aws directory:
+
+    python -m benchmarks.vpc_layout
+"""
+import argparse
+import asyncio
+import ipaddress
+import json
+import os
+import sys
+
+from benchmarks.apps import REPO_DIR
+from benchmarks.pulumi_graph import REGION
+
+ZONES = [f"{REGION}{letter}" for letter in "abcd"]
+
+EXPECTED_FIRST_TWO = {
+    "public-subnet-a": "10.0.1.0/24",
+    "public-subnet-b": "10.0.2.0/24",
+    "private-subnet-a": "10.0.3.0/24",
+    "private-subnet-b": "10.0.4.0/24",
+}
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"ok   {message}")
+
+
+def subnet_layouts(az_counts, cidr_block):
+    """{az_count: {subnet name without the VPC name: CIDR block}}, each VPC built under mocks."""
+    os.environ["PULUMI_CONFIG"] = json.dumps({"aws:region": REGION})
+    import pulumi
+    from pulumi.runtime.stack import wait_for_rpcs
+
+    subnets = {}
+
+    class LayoutMocks(pulumi.runtime.Mocks):
+        def new_resource(self, args):
+            if args.typ == "aws:ec2/subnet:Subnet":
+                subnets[args.name] = args.inputs["cidrBlock"]
+            return [f"{args.name}-id", args.inputs]
+
+        def call(self, args):
+            if args.token == "aws:index/getAvailabilityZones:getAvailabilityZones":
+                return {"names": ZONES}
+            return {}
+
+    pulumi.runtime.set_mocks(LayoutMocks(), project="vpc-layout", stack="check", preview=True)
+    sys.path.insert(0, str(REPO_DIR))
+    from pulumi_shared.vpc import create_vpc
+
+    for az_count in az_counts:
+        create_vpc(f"az{az_count}", cidr_block=cidr_block, az_count=az_count)
+    asyncio.get_event_loop().run_until_complete(wait_for_rpcs())
+    return {
+        az_count: {name.split("-", 1)[1]: cidr for name, cidr in subnets.items() if name.startswith(f"az{az_count}-")}
+        for az_count in az_counts
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cidr-block", default="10.0.0.0/16")
+    args = parser.parse_args()
+
+    layouts = subnet_layouts([2, 3, 4], args.cidr_block)
+    for az_count, layout in layouts.items():
+        print(f"     {az_count} AZs: " + ", ".join(f"{name} {cidr}" for name, cidr in sorted(layout.items())))
+        check(len(layout) == 2 * az_count, f"{az_count} AZs: a public and a private subnet per AZ")
+        blocks = [ipaddress.ip_network(cidr) for cidr in layout.values()]
+        check(
+            all(block.subnet_of(ipaddress.ip_network(args.cidr_block)) for block in blocks)
+            and not any(a.overlaps(b) for i, a in enumerate(blocks) for b in blocks[i + 1:]),
+            f"{az_count} AZs: subnets do not overlap and fit in {args.cidr_block}",
+        )
+        first_two = {name: cidr for name, cidr in layout.items() if name in EXPECTED_FIRST_TWO}
+        if args.cidr_block == "10.0.0.0/16":
+            check(first_two == EXPECTED_FIRST_TWO, f"{az_count} AZs: AZs a and b keep 10.0.1-4.0/24")
+        check(first_two == {name: layouts[2][name] for name in first_two},
+              f"{az_count} AZs: AZs a and b have the same blocks as with 2 AZs")
+    for smaller, larger in zip(sorted(layouts), sorted(layouts)[1:]):
+        moved = sorted(name for name, cidr in layouts[smaller].items() if layouts[larger][name] != cidr)
+        check(not moved, f"going from {smaller} to {larger} AZs moves no subnet")
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,75 @@
 import json
 import hashlib
+import os
+import sys
 import pulumi
 import pulumi_aws as aws
 import pulumi_tls as tls
 import base64
+
+# Modules shared by the Pulumi programs in this repo (pulumi_shared/ at the repo root)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from pulumi_shared.ami import AMAZON_LINUX_2, get_ami_id
+from pulumi_shared.vpc import DEFAULT_ENDPOINTS
 from ec2_instance import create_ec2_instance
 from vpc import create_vpc
 from rds import create_rds_instance
 from secrets import create_secrets_with_kms, create_ssm_secrets
+from archive_bucket import create_archive_bucket
+from user_data_bootstrap import create_user_data_bootstrap
+
+
+def config_or_default(value, default):
+    # For numbers where 0 is a real setting (asgMinSize=0 lets the group scale in to nothing): only unset means default
+    return default if value is None else value
+
 
 # Configuration
 config = pulumi.Config()
 key_name = config.get("keyName")
 instance_type = config.get("instanceType") or "t2.micro"
-auto_scaling = False
+# Seconds an idle connection (including a WebSocket) stays open on the ALB; keep it above WS_HEARTBEAT_INTERVAL in user_data.sh
+alb_idle_timeout = config.get_int("albIdleTimeout") or 120
+# Read replicas of the chatbot database; /history reads go to them (see db_routing.py in user_data.sh)
+db_replica_count = config.get_int("dbReplicaCount") or 0
+# Connection pooling between the app and the primary: "none", "rds_proxy" (shared RDS Proxy)
+# or "pgbouncer" (a PgBouncer on every instance, see user_data.sh)
+db_connection_pooler = config.get("dbConnectionPooler") or "none"
+if db_connection_pooler not in ("none", "rds_proxy", "pgbouncer"):
+    raise ValueError(f"dbConnectionPooler must be none, rds_proxy or pgbouncer, not {db_connection_pooler!r}")
+# Availability zones for the VPC's subnets; the ALB and the ASG spread over all of them
+vpc_az_count = config_or_default(config.get_int("azCount"), 2)
+if vpc_az_count < 2:
+    raise ValueError(f"azCount must be at least 2 (the RDS subnet group and the ALB need two AZs), not {vpc_az_count}")
+# VPC endpoints for S3, SSM, CloudWatch Logs and metrics, so that traffic stays off the internet (see pulumi_shared/vpc.py)
+vpc_endpoints = config.get_bool("vpcEndpoints") or False
+# Single EC2 instance (default) or an Auto Scaling group behind an ALB
+auto_scaling = config.get_bool("autoScaling") or False
+# Auto Scaling group size
+asg_min_size = config_or_default(config.get_int("asgMinSize"), 2)
+asg_max_size = config_or_default(config.get_int("asgMaxSize"), 4)
+asg_desired_capacity = config_or_default(config.get_int("asgDesiredCapacity"), asg_min_size)
+if not asg_min_size <= asg_desired_capacity <= asg_max_size:
+    raise ValueError(
+        f"asgMinSize <= asgDesiredCapacity <= asgMaxSize does not hold: {asg_min_size}, {asg_desired_capacity}, {asg_max_size}"
+    )
+# How the group scales: "target_tracking" (ALB requests per instance and CPU) or "step" (±1 on 5-minute CPU alarms)
+scaling_mode = config.get("scalingMode") or "target_tracking"
+if scaling_mode not in ("target_tracking", "step"):
+    raise ValueError(f"scalingMode must be target_tracking or step, not {scaling_mode!r}")
+target_requests_per_target = config_or_default(config.get_float("targetRequestsPerTarget"), 100)
+target_cpu_utilization = config_or_default(config.get_float("targetCpuUtilization"), 50)
+if target_requests_per_target <= 0 or target_cpu_utilization <= 0:
+    raise ValueError("targetRequestsPerTarget and targetCpuUtilization must be greater than 0")
+# Average ALB target response time in seconds to scale out at; unset disables the latency policy
+target_response_time = config.get_float("targetResponseTime")
+# Predictive scaling on ALB request count: "off", "forecast_only" or "forecast_and_scale"
+predictive_scaling = config.get("predictiveScaling") or "off"
+if predictive_scaling not in ("off", "forecast_only", "forecast_and_scale"):
+    raise ValueError(f"predictiveScaling must be off, forecast_only or forecast_and_scale, not {predictive_scaling!r}")
+
+# Latest Amazon Linux 2, looked up once and pinned in ami.lock.json (see pulumi_shared/ami.py)
+amazon_linux_ami = get_ami_id(**AMAZON_LINUX_2)
 
 # Generate a private key
 private_key = tls.PrivateKey("chatbot-private-key",
@@ -46,7 +102,11 @@ with open("user_data.sh", "r") as f:
 
 
 # Create VPC and networking components
-network = create_vpc("chatbot")
+network = create_vpc(
+    "chatbot",
+    az_count=vpc_az_count,
+    endpoints=DEFAULT_ENDPOINTS if vpc_endpoints else (),
+)
 
 # Create a security group for app server within the VPC
 web_sg = aws.ec2.SecurityGroup(
@@ -107,6 +167,17 @@ db_sg = aws.ec2.SecurityGroup(
     tags={"Name": "chatbot-db-sg"},
 )
 
+if db_connection_pooler == "rds_proxy":
+    # The proxy sits in db-sg next to the database, so members of the group must reach each other
+    db_sg_proxy_rule = aws.ec2.SecurityGroupRule(
+        "db-sg-rule-from-proxy",
+        type="ingress",
+        from_port=5432,
+        to_port=5432,
+        protocol="tcp",
+        security_group_id=db_sg.id,
+        self=True,
+    )
 
 
 # Create the RDS instance
@@ -116,6 +187,8 @@ database = create_rds_instance(
     # [subnet.id for subnet in network["private_subnets"]],
     [subnet.id for subnet in network["public_subnets"]],
     [db_sg.id],
+    replica_count=db_replica_count,
+    proxy=db_connection_pooler == "rds_proxy",
 )
 
 # Create secrets for database credentials
@@ -160,11 +233,21 @@ db_secrets = create_ssm_secrets(
     {
         "username": database["username"],
         "password": database["password"],
-        "host": database["instance"].address,
+        # The app connects through the proxy when there is one; it speaks the same protocol on the same port
+        "host": database["proxy"].endpoint if database["proxy"] else database["instance"].address,
+        # Becomes DB_PRIMARY_HOST: the partition and archive jobs always connect to the instance itself,
+        # so their DDL and long transactions never pin proxy connections
+        "primary_host": database["instance"].address,
         "port": database["instance"].port.apply(lambda p: str(p)),
         "dbname": database["database"],
+        # Becomes DB_REPLICA_HOSTS on the instances (SSM rejects empty values, so only set with replicas)
+        **({"replica_hosts": pulumi.Output.all(*[r.address for r in database["replicas"]]).apply(",".join)}
+           if database["replicas"] else {}),
     },
 )
+pulumi.export("db_replica_endpoints", [replica.endpoint for replica in database["replicas"]])
+if database["proxy"]:
+    pulumi.export("db_proxy_endpoint", database["proxy"].endpoint)
 
 # Export the secret name for reference
 pulumi.export("db_param_path", "/chatbot/db")
@@ -172,11 +255,22 @@ pulumi.export("db_param_path", "/chatbot/db")
 # If you're using aws.ec2.Instance, you do not need to Base64 encode user_data manually. Pulumi does it for you.
 # If You ARE Using a Launch Template (e.g., for Auto Scaling), AWS expects Base64, but you need to manually wrap it into an Output
 
+# Bucket for messages moved out of the database by the archive job in user_data.sh
+archive = create_archive_bucket("chatbot")
+pulumi.export("archive_bucket", archive["bucket"].bucket)
+
 # user_data = user_data_template.replace("${DB_PARAM_PATH}", "/chatbot/db")
 user_data = pulumi.Output.secret(
-    user_data_template.replace("${DB_PARAM_PATH}", "/chatbot/db")
+    archive["bucket"].bucket.apply(
+        lambda bucket_name: user_data_template.replace("${DB_PARAM_PATH}", "/chatbot/db")
+                                              .replace("${ARCHIVE_BUCKET}", bucket_name)
+                                              .replace("${DB_POOLER}", db_connection_pooler)
+    )
 )
-user_data_base64 = user_data.apply(
+# NOTE EC2 caps user data at 16 KB and the script is larger than that even gzipped. It is stored in S3,
+# and the instance and the launch template get a short bootstrap that downloads and runs it.
+bootstrap = create_user_data_bootstrap("chatbot", user_data)
+user_data_base64 = bootstrap["user_data"].apply(
     lambda data: base64.b64encode(data.encode("utf-8")).decode("utf-8")
 )
 
@@ -278,6 +372,20 @@ logs_policy_attachment = aws.iam.RolePolicyAttachment(
     policy_arn=logs_policy.arn,
 )
 
+# Allow the instances to upload message archives
+archive_policy_attachment = aws.iam.RolePolicyAttachment(
+    "archive-policy-attachment",
+    role=ec2_role.name,
+    policy_arn=archive["policy"].arn,
+)
+
+# Allow the instances to download the setup script
+bootstrap_policy_attachment = aws.iam.RolePolicyAttachment(
+    "bootstrap-policy-attachment",
+    role=ec2_role.name,
+    policy_arn=bootstrap["policy"].arn,
+)
+
 # Create an instance profile
 instance_profile = aws.iam.InstanceProfile(
     "instance-profile",
@@ -316,23 +424,14 @@ if not auto_scaling:
     instance = aws.ec2.Instance(
         "chatbot-server",
         instance_type=instance_type,
-        ami=aws.ec2.get_ami(
-            most_recent=True,
-            owners=["amazon"],
-            filters=[
-                aws.ec2.GetAmiFilterArgs(
-                    name="name",
-                    values=["amzn2-ami-hvm-*-x86_64-gp2"],
-                ),
-            ],
-        ).id,
+        ami=amazon_linux_ami,
         key_name=key_pair.key_name,
         subnet_id=network["public_subnets"][0].id,
         vpc_security_group_ids=[web_sg.id],
         iam_instance_profile=instance_profile.name,
-        user_data=user_data,
+        user_data_base64=user_data_base64,
         opts=pulumi.ResourceOptions(
-            depends_on=list(db_secrets.values()), # NOTE Pulumi will correctly wait for all the SSM parameters to be created before launching the EC2 instance and running user_data.
+            depends_on=list(db_secrets.values()) + [bootstrap_policy_attachment], # NOTE Pulumi will correctly wait for all the SSM parameters to be created before launching the EC2 instance and running user_data.
             delete_before_replace=True  # Ensures Pulumi destroys and recreates the instance
         ),
         # Enable detailed monitoring (1-minute intervals instead of 5)
@@ -523,16 +622,7 @@ else:
     # This defines how EC2 instances should be launched
     launch_template = aws.ec2.LaunchTemplate(
         "chatbot-launch-template",
-        image_id=aws.ec2.get_ami(
-            most_recent=True,
-            owners=["amazon"],
-            filters=[
-                aws.ec2.GetAmiFilterArgs(
-                    name="name",
-                    values=["amzn2-ami-hvm-*-x86_64-gp2"],
-                ),
-            ],
-        ).id,
+        image_id=amazon_linux_ami,
         instance_type=instance_type,
         key_name=key_pair.key_name,
         vpc_security_group_ids=[web_sg.id],
@@ -544,7 +634,7 @@ else:
             enabled=True,  # Enable detailed monitoring
         ),
         opts=pulumi.ResourceOptions(
-            depends_on=list(db_secrets.values()),
+            depends_on=list(db_secrets.values()) + [bootstrap_policy_attachment],
             delete_before_replace=True  # Ensures Pulumi destroys and recreates the template
         ),
         tag_specifications=[
@@ -606,24 +696,29 @@ else:
     # Creates an Application Load Balancer:
         # Public-facing (not internal)
         # Spread across multiple public subnets
+        # WebSocket upgrades (/ws/chat/...) pass through the HTTP listener as-is; the server heartbeat
+        # keeps them under idle_timeout
     load_balancer = aws.lb.LoadBalancer(
         "chatbot-lb",
         internal=False,
         load_balancer_type="application",
         security_groups=[lb_sg.id],
         subnets=[subnet.id for subnet in network["public_subnets"]],
+        idle_timeout=alb_idle_timeout,
         enable_deletion_protection=False,
         tags={"Name": "chatbot-lb"},
     )
 
     # Create a target group for the ALB
     # Targets are EC2 instances listening on port 80.
+    # Open WebSockets are drained for up to deregistration_delay seconds when an instance scales in.
     target_group = aws.lb.TargetGroup(
         "chatbot-tg",
         port=80,
         protocol="HTTP",
         vpc_id=network["vpc"].id,
         target_type="instance",
+        deregistration_delay=120,
         health_check=aws.lb.TargetGroupHealthCheckArgs(
             enabled=True,
             path="/",
@@ -650,15 +745,15 @@ else:
     )
 
     # Create an auto scaling group
-        # Launches 2–4 EC2 instances based on load.
+        # Launches asgMinSize–asgMaxSize EC2 instances (2–4 by default) based on load.
         # Uses the launch_template.
         # Spreads instances across the public subnets.
         # Attaches to the target group, so traffic can be load-balanced.
     auto_scaling_group = aws.autoscaling.Group(
         "chatbot-asg",
-        max_size=4,
-        min_size=2,
-        desired_capacity=2,
+        max_size=asg_max_size,
+        min_size=asg_min_size,
+        desired_capacity=asg_desired_capacity,
         vpc_zone_identifiers=[subnet.id for subnet in network["public_subnets"]],
         target_group_arns=[target_group.arn],
         health_check_type="ELB",
@@ -669,6 +764,9 @@ else:
         ),
         opts=pulumi.ResourceOptions(
             depends_on=[launch_template] + list(db_secrets.values()),
+            # The scaling policies own the desired capacity once the group exists; without this every
+            # `pulumi up` would reset it to asgDesiredCapacity, undoing a scale-out in the middle of a spike
+            ignore_changes=["desired_capacity"],
         ),
         tags=[
             aws.autoscaling.GroupTagArgs(
@@ -679,59 +777,147 @@ else:
         ],
     )
 
-    # Create scaling policies
-    # Define how many instances to add or remove when scaling is triggered:
-        # Scale up: Add 1 instance.
-        # Scale down: Remove 1 instance.
-        # Both have a cooldown of 5 minutes (300 seconds).
-    scale_up_policy = aws.autoscaling.Policy(
-        "scale-up-policy",
-        autoscaling_group_name=auto_scaling_group.name,
-        adjustment_type="ChangeInCapacity",
-        scaling_adjustment=1,
-        cooldown=300,
-    )
-
-    scale_down_policy = aws.autoscaling.Policy(
-        "scale-down-policy",
-        autoscaling_group_name=auto_scaling_group.name,
-        adjustment_type="ChangeInCapacity",
-        scaling_adjustment=-1,
-        cooldown=300,
-    )
-
-    # Create CloudWatch alarms for scaling
-    # Set up CloudWatch alarms to trigger scaling:
-        # High CPU (>70%) for 2 intervals → scale up.
-        # Low CPU (<30%) for 2 intervals → scale down.
-        # Based on average EC2 CPU usage over 5-minute periods.
-    high_cpu_alarm = aws.cloudwatch.MetricAlarm(
-        "high-cpu-alarm",
-        comparison_operator="GreaterThanThreshold",
-        evaluation_periods=2,
-        metric_name="CPUUtilization",
-        namespace="AWS/EC2",
-        period=300,
-        statistic="Average",
-        threshold=70,
-        alarm_description="Scale up when CPU > 70%",
-        alarm_actions=[scale_up_policy.arn],
-        dimensions={"AutoScalingGroupName": auto_scaling_group.name},
-    )
-
-    low_cpu_alarm = aws.cloudwatch.MetricAlarm(
-        "low-cpu-alarm",
-        comparison_operator="LessThanThreshold",
-        evaluation_periods=2,
-        metric_name="CPUUtilization",
-        namespace="AWS/EC2",
-        period=300,
-        statistic="Average",
-        threshold=30,
-        alarm_description="Scale down when CPU < 30%",
-        alarm_actions=[scale_down_policy.arn],
-        dimensions={"AutoScalingGroupName": auto_scaling_group.name},
-    )
+    # ALB request count per instance is labelled "<load balancer arn suffix>/<target group arn suffix>"
+    alb_resource_label = pulumi.Output.concat(load_balancer.arn_suffix, "/", target_group.arn_suffix)
+
+    if scaling_mode == "target_tracking":
+        # Create target tracking policies
+        # Each policy keeps its metric near the target, adding or removing as many instances as needed at once.
+        # The group scales out when any policy asks for more capacity, and scales in only when all of them allow it.
+            # Requests per instance: the app is mostly I/O bound, so request count tracks load better than CPU.
+            # CPU: a backstop for CPU-heavy requests.
+        # New instances are left out of the metrics for 300 seconds, while user data installs and starts the app.
+        request_count_policy = aws.autoscaling.Policy(
+            "request-count-tracking-policy",
+            autoscaling_group_name=auto_scaling_group.name,
+            policy_type="TargetTrackingScaling",
+            estimated_instance_warmup=300,
+            target_tracking_configuration=aws.autoscaling.PolicyTargetTrackingConfigurationArgs(
+                predefined_metric_specification=aws.autoscaling.PolicyTargetTrackingConfigurationPredefinedMetricSpecificationArgs(
+                    predefined_metric_type="ALBRequestCountPerTarget",
+                    resource_label=alb_resource_label,
+                ),
+                target_value=target_requests_per_target,
+            ),
+            # The target group has to be attached to the load balancer before AWS accepts the label
+            opts=pulumi.ResourceOptions(depends_on=[listener]),
+        )
+
+        cpu_policy = aws.autoscaling.Policy(
+            "cpu-tracking-policy",
+            autoscaling_group_name=auto_scaling_group.name,
+            policy_type="TargetTrackingScaling",
+            estimated_instance_warmup=300,
+            target_tracking_configuration=aws.autoscaling.PolicyTargetTrackingConfigurationArgs(
+                predefined_metric_specification=aws.autoscaling.PolicyTargetTrackingConfigurationPredefinedMetricSpecificationArgs(
+                    predefined_metric_type="ASGAverageCPUUtilization",
+                ),
+                target_value=target_cpu_utilization,
+            ),
+        )
+
+        # Latency does not fall in proportion to the instances added, so this policy only scales out;
+        # the request count and CPU policies scale back in.
+        if target_response_time:
+            latency_policy = aws.autoscaling.Policy(
+                "latency-tracking-policy",
+                autoscaling_group_name=auto_scaling_group.name,
+                policy_type="TargetTrackingScaling",
+                estimated_instance_warmup=300,
+                target_tracking_configuration=aws.autoscaling.PolicyTargetTrackingConfigurationArgs(
+                    customized_metric_specification=aws.autoscaling.PolicyTargetTrackingConfigurationCustomizedMetricSpecificationArgs(
+                        metric_name="TargetResponseTime",
+                        namespace="AWS/ApplicationELB",
+                        statistic="Average",
+                        metric_dimensions=[
+                            aws.autoscaling.PolicyTargetTrackingConfigurationCustomizedMetricSpecificationMetricDimensionArgs(
+                                name="LoadBalancer", value=load_balancer.arn_suffix,
+                            ),
+                            aws.autoscaling.PolicyTargetTrackingConfigurationCustomizedMetricSpecificationMetricDimensionArgs(
+                                name="TargetGroup", value=target_group.arn_suffix,
+                            ),
+                        ],
+                    ),
+                    target_value=target_response_time,
+                    disable_scale_in=True,
+                ),
+            )
+
+        # Create a predictive scaling policy
+        # Forecasts ALB request count from up to 14 days of history and launches instances 5 minutes ahead of it.
+        # forecast_only publishes the forecast without acting on it, to check it before switching to forecast_and_scale.
+        if predictive_scaling != "off":
+            predictive_policy = aws.autoscaling.Policy(
+                "predictive-scaling-policy",
+                autoscaling_group_name=auto_scaling_group.name,
+                policy_type="PredictiveScaling",
+                predictive_scaling_configuration=aws.autoscaling.PolicyPredictiveScalingConfigurationArgs(
+                    mode="ForecastOnly" if predictive_scaling == "forecast_only" else "ForecastAndScale",
+                    scheduling_buffer_time="300",
+                    metric_specification=aws.autoscaling.PolicyPredictiveScalingConfigurationMetricSpecificationArgs(
+                        predefined_metric_pair_specification=aws.autoscaling.PolicyPredictiveScalingConfigurationMetricSpecificationPredefinedMetricPairSpecificationArgs(
+                            predefined_metric_type="ALBRequestCount",
+                            resource_label=alb_resource_label,
+                        ),
+                        target_value=target_requests_per_target,
+                    ),
+                ),
+                opts=pulumi.ResourceOptions(depends_on=[listener]),
+            )
+    else:
+        # Create scaling policies
+        # Define how many instances to add or remove when scaling is triggered:
+            # Scale up: Add 1 instance.
+            # Scale down: Remove 1 instance.
+            # Both have a cooldown of 5 minutes (300 seconds).
+        scale_up_policy = aws.autoscaling.Policy(
+            "scale-up-policy",
+            autoscaling_group_name=auto_scaling_group.name,
+            adjustment_type="ChangeInCapacity",
+            scaling_adjustment=1,
+            cooldown=300,
+        )
+
+        scale_down_policy = aws.autoscaling.Policy(
+            "scale-down-policy",
+            autoscaling_group_name=auto_scaling_group.name,
+            adjustment_type="ChangeInCapacity",
+            scaling_adjustment=-1,
+            cooldown=300,
+        )
+
+        # Create CloudWatch alarms for scaling
+        # Set up CloudWatch alarms to trigger scaling:
+            # High CPU (>70%) for 2 intervals → scale up.
+            # Low CPU (<30%) for 2 intervals → scale down.
+            # Based on average EC2 CPU usage over 5-minute periods.
+        high_cpu_alarm = aws.cloudwatch.MetricAlarm(
+            "high-cpu-alarm",
+            comparison_operator="GreaterThanThreshold",
+            evaluation_periods=2,
+            metric_name="CPUUtilization",
+            namespace="AWS/EC2",
+            period=300,
+            statistic="Average",
+            threshold=70,
+            alarm_description="Scale up when CPU > 70%",
+            alarm_actions=[scale_up_policy.arn],
+            dimensions={"AutoScalingGroupName": auto_scaling_group.name},
+        )
+
+        low_cpu_alarm = aws.cloudwatch.MetricAlarm(
+            "low-cpu-alarm",
+            comparison_operator="LessThanThreshold",
+            evaluation_periods=2,
+            metric_name="CPUUtilization",
+            namespace="AWS/EC2",
+            period=300,
+            statistic="Average",
+            threshold=30,
+            alarm_description="Scale down when CPU < 30%",
+            alarm_actions=[scale_down_policy.arn],
+            dimensions={"AutoScalingGroupName": auto_scaling_group.name},
+        )
 
     # Create a CloudWatch alarm for RDS high CPU
     rds_cpu_alarm = aws.cloudwatch.MetricAlarm(
@@ -0,0 +1,86 @@
+import json
+
+import pulumi_aws as aws
+
+def create_archive_bucket(name, transition_days=30):
+    """
+    S3 bucket for archived chat messages (written by archive.py in user_data.sh),
+    plus a policy that lets the instances upload to it.
+    """
+    bucket = aws.s3.BucketV2(
+        f"{name}-archive",
+        bucket_prefix=f"{name}-archive-",
+        force_destroy=False,  # Keep archived messages when the stack is destroyed
+        tags={"Name": f"{name}-archive"},
+    )
+
+    # Archives are never public
+    aws.s3.BucketPublicAccessBlock(
+        f"{name}-archive-public-access",
+        bucket=bucket.id,
+        block_public_acls=True,
+        block_public_policy=True,
+        ignore_public_acls=True,
+        restrict_public_buckets=True,
+    )
+
+    aws.s3.BucketServerSideEncryptionConfigurationV2(
+        f"{name}-archive-encryption",
+        bucket=bucket.id,
+        rules=[aws.s3.BucketServerSideEncryptionConfigurationV2RuleArgs(
+            apply_server_side_encryption_by_default=aws.s3.BucketServerSideEncryptionConfigurationV2RuleApplyServerSideEncryptionByDefaultArgs(
+                sse_algorithm="AES256",
+            ),
+        )],
+    )
+
+    """
+    Archived objects are read rarely, so they move to Standard-IA after `transition_days`.
+    Multipart uploads that were never completed (a crashed archive run) are cleaned up after a day,
+    otherwise their parts are billed forever without showing up as objects.
+    """
+    aws.s3.BucketLifecycleConfigurationV2(
+        f"{name}-archive-lifecycle",
+        bucket=bucket.id,
+        rules=[
+            aws.s3.BucketLifecycleConfigurationV2RuleArgs(
+                id="infrequent-access",
+                status="Enabled",
+                filter=aws.s3.BucketLifecycleConfigurationV2RuleFilterArgs(prefix=""),
+                transitions=[aws.s3.BucketLifecycleConfigurationV2RuleTransitionArgs(
+                    days=transition_days,
+                    storage_class="STANDARD_IA",
+                )],
+            ),
+            aws.s3.BucketLifecycleConfigurationV2RuleArgs(
+                id="abort-incomplete-uploads",
+                status="Enabled",
+                filter=aws.s3.BucketLifecycleConfigurationV2RuleFilterArgs(prefix=""),
+                abort_incomplete_multipart_upload=aws.s3.BucketLifecycleConfigurationV2RuleAbortIncompleteMultipartUploadArgs(
+                    days_after_initiation=1,
+                ),
+            ),
+        ],
+    )
+
+    # Write-only access for the instances: no reads or deletes of existing archives
+    policy = aws.iam.Policy(
+        f"{name}-archive-policy",
+        policy=bucket.arn.apply(lambda arn: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Effect": "Allow",
+                "Action": [
+                    "s3:PutObject",
+                    "s3:AbortMultipartUpload",
+                    "s3:ListMultipartUploadParts",
+                ],
+                "Resource": f"{arn}/*",
+            }],
+        })),
+    )
+
+    return {
+        "bucket": bucket,
+        "policy": policy,
+    }
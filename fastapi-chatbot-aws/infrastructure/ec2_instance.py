@@ -2,18 +2,11 @@ import pulumi
 import pulumi_aws as aws
 import base64
 
+from pulumi_shared.ami import AMAZON_LINUX_2, get_ami_id
+
 def create_ec2_instance(name, instance_type, key_name=None, user_data=None):
     # Get the latest Amazon Linux 2 AMI
-    ami = aws.ec2.get_ami(
-        most_recent=True,
-        owners=["amazon"],
-        filters=[
-            aws.ec2.GetAmiFilterArgs(
-                name="name",
-                values=["amzn2-ami-hvm-*-x86_64-gp2"],
-            ),
-        ],
-    )
+    ami_id = get_ami_id(**AMAZON_LINUX_2)
 
     # Create a security group
     security_group = aws.ec2.SecurityGroup(
@@ -49,7 +42,7 @@ def create_ec2_instance(name, instance_type, key_name=None, user_data=None):
     instance = aws.ec2.Instance(
         name,
         instance_type=instance_type,
-        ami=ami.id,
+        ami=ami_id,
         key_name=key_name,
         vpc_security_group_ids=[security_group.id],
         user_data=user_data,
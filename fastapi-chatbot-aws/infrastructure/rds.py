@@ -1,8 +1,11 @@
+import json
+
 import pulumi
 import pulumi_aws as aws
 import pulumi_random as random
 
-def create_rds_instance(name, vpc_id, subnet_ids, security_group_ids):
+def create_rds_instance(name, vpc_id, subnet_ids, security_group_ids, replica_count=0, replica_instance_class="db.t3.micro",
+                        proxy=False):
     # Generate a random password for the database
     db_password = random.RandomPassword(
         f"{name}-password",
@@ -77,14 +80,138 @@ def create_rds_instance(name, vpc_id, subnet_ids, security_group_ids):
         db_subnet_group_name=subnet_group.name,
         publicly_accessible=False,  # Even though in public subnet, restrict direct public access
         multi_az=False,  # For production, set to true for high availability
-        backup_retention_period=0,  # Disable automated backups for free tier
+        # Automated backups are off for the free tier, but RDS needs them on the source of a read replica
+        backup_retention_period=1 if replica_count else 0,
         apply_immediately=True,
         tags={"Name": f"{name}-db"},
     )
+
+    """
+    Read replicas copy the primary asynchronously (usually well under a second behind).
+    They share the primary's subnet group and parameter group and accept only reads,
+    so the app routes /history to them and keeps every write on the primary.
+    """
+    replicas = [
+        aws.rds.Instance(
+            f"{name}-db-replica-{index}",
+            replicate_source_db=db_instance.identifier,
+            instance_class=replica_instance_class,
+            storage_type="gp2",
+            parameter_group_name=db_parameter_group.name,
+            vpc_security_group_ids=security_group_ids,
+            publicly_accessible=False,
+            skip_final_snapshot=True,  # For development only
+            backup_retention_period=0,
+            apply_immediately=True,
+            tags={"Name": f"{name}-db-replica-{index}"},
+        )
+        for index in range(replica_count)
+    ]
+
+    db_proxy = create_rds_proxy(name, db_instance, db_password.result, subnet_ids, security_group_ids) if proxy else None
     
     return {
         "instance": db_instance,
+        "replicas": replicas,
+        "proxy": db_proxy,
         "password": db_password.result,
         "username": "dbadmin",
         "database": "chatbot",
-    }
\ No newline at end of file
+    }
+
+
+def create_rds_proxy(name, db_instance, password, subnet_ids, security_group_ids):
+    """
+    RDS Proxy in front of the primary. Every gunicorn worker on every instance connects to the
+    proxy, which multiplexes them onto a bounded set of database connections, so scaling out
+    the ASG no longer exhausts the connection limit of a small instance class.
+
+    The proxy logs in with credentials from Secrets Manager, read through an IAM role that
+    only the RDS service can assume. Clients keep using the same username and password.
+    """
+    secret = aws.secretsmanager.Secret(
+        f"{name}-proxy-credentials",
+        name_prefix=f"{name}-proxy-credentials-",
+        recovery_window_in_days=0,  # For development only
+        tags={"Name": f"{name}-proxy-credentials"},
+    )
+
+    secret_version = aws.secretsmanager.SecretVersion(
+        f"{name}-proxy-credentials-version",
+        secret_id=secret.id,
+        secret_string=pulumi.Output.all(db_instance.username, password).apply(
+            lambda args: json.dumps({"username": args[0], "password": args[1]})
+        ),
+    )
+
+    proxy_role = aws.iam.Role(
+        f"{name}-proxy-role",
+        assume_role_policy=json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": "sts:AssumeRole",
+                "Effect": "Allow",
+                "Principal": {"Service": "rds.amazonaws.com"},
+            }],
+        }),
+    )
+
+    proxy_policy = aws.iam.RolePolicy(
+        f"{name}-proxy-secret-policy",
+        role=proxy_role.id,
+        policy=secret.arn.apply(lambda arn: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [
+                {
+                    "Effect": "Allow",
+                    "Action": ["secretsmanager:GetSecretValue"],
+                    "Resource": arn,
+                },
+                {
+                    # The secret uses the AWS managed key, which may only be used through Secrets Manager
+                    "Effect": "Allow",
+                    "Action": ["kms:Decrypt"],
+                    "Resource": "*",
+                    "Condition": {"StringEquals": {"kms:ViaService": f"secretsmanager.{aws.config.region}.amazonaws.com"}},
+                },
+            ],
+        })),
+    )
+
+    db_proxy = aws.rds.Proxy(
+        f"{name}-proxy",
+        name=f"{name}-proxy",
+        engine_family="POSTGRESQL",
+        role_arn=proxy_role.arn,
+        vpc_subnet_ids=subnet_ids,
+        vpc_security_group_ids=security_group_ids,
+        require_tls=True,
+        idle_client_timeout=1800,  # seconds; the app recycles its pooled connections well before this
+        auths=[aws.rds.ProxyAuthArgs(
+            auth_scheme="SECRETS",
+            iam_auth="DISABLED",
+            secret_arn=secret.arn,
+        )],
+        tags={"Name": f"{name}-proxy"},
+        opts=pulumi.ResourceOptions(depends_on=[secret_version, proxy_policy]),
+    )
+
+    # Share of max_connections the proxy may open, and how long a client waits to borrow one
+    target_group = aws.rds.ProxyDefaultTargetGroup(
+        f"{name}-proxy-target-group",
+        db_proxy_name=db_proxy.name,
+        connection_pool_config=aws.rds.ProxyDefaultTargetGroupConnectionPoolConfigArgs(
+            max_connections_percent=90,
+            max_idle_connections_percent=50,
+            connection_borrow_timeout=30,
+        ),
+    )
+
+    aws.rds.ProxyTarget(
+        f"{name}-proxy-target",
+        db_proxy_name=db_proxy.name,
+        target_group_name=target_group.name,
+        db_instance_identifier=db_instance.identifier,
+    )
+
+    return db_proxy
@@ -31,7 +31,7 @@ yum install -y postgresql postgresql-devel
 
 # Install application dependencies
 pip3 install --upgrade pip
-pip3 install fastapi uvicorn gunicorn psycopg2-binary sqlalchemy boto3
+pip3 install fastapi uvicorn websockets gunicorn psycopg2-binary sqlalchemy boto3 orjson prometheus_client zstandard
 # Install psycopg2 for PostgreSQL
 pip3 install psycopg2-binary sqlalchemy
 
@@ -199,9 +199,49 @@ EOF
 chmod +x /opt/chatbot/test_connection.py
 sudo bash -c "set -a && source /etc/profile.d/db_env.sh && set +a  && python3 /opt/chatbot/test_connection.py 2>> /opt/chatbot/logs/ssm_fetch.log"
 
+# Optional PgBouncer on every instance (dbConnectionPooler=pgbouncer in the Pulumi config). The gunicorn
+# workers connect to it on 127.0.0.1:6432 without a pool of their own, and it keeps at most
+# default_pool_size connections to the database open, however many instances the ASG runs.
+DB_POOLER="${DB_POOLER}"
+if [ "$DB_POOLER" = "pgbouncer" ]; then
+    amazon-linux-extras install -y epel
+    yum install -y pgbouncer
+
+    set -a && source /etc/profile.d/db_env.sh && set +a
+    cat <<EOF > /etc/pgbouncer/pgbouncer.ini
+[databases]
+$DB_DBNAME = host=$DB_HOST port=$DB_PORT dbname=$DB_DBNAME
+
+[pgbouncer]
+listen_addr = 127.0.0.1
+listen_port = 6432
+auth_type = scram-sha-256
+auth_file = /etc/pgbouncer/userlist.txt
+; A server connection goes back to the pool at the end of every transaction
+pool_mode = transaction
+default_pool_size = 10
+max_client_conn = 1000
+server_idle_timeout = 300
+; RDS for PostgreSQL 17 only accepts encrypted connections
+server_tls_sslmode = require
+; Sent by some drivers on connect; harmless to drop
+ignore_startup_parameters = extra_float_digits
+logfile = /var/log/pgbouncer/pgbouncer.log
+pidfile = /var/run/pgbouncer/pgbouncer.pid
+EOF
+    # The plain password lets PgBouncer do SCRAM with both the app and the server
+    echo "\"$DB_USERNAME\" \"$DB_PASSWORD\"" > /etc/pgbouncer/userlist.txt
+    chown pgbouncer:pgbouncer /etc/pgbouncer/pgbouncer.ini /etc/pgbouncer/userlist.txt
+    chmod 600 /etc/pgbouncer/userlist.txt
+
+    systemctl enable pgbouncer
+    systemctl restart pgbouncer
+fi
+
 # Add logging configuration to FastAPI app
 cat << 'EOF' > /opt/chatbot/logging_config.py
 import logging
+import os
 import sys
 from logging.handlers import RotatingFileHandler
 
@@ -212,7 +252,7 @@ def setup_logging():
     
     # Create file handler
     file_handler = RotatingFileHandler(
-        "/opt/chatbot/app.log",
+        os.getenv("LOG_FILE", "/opt/chatbot/app.log"),
         maxBytes=10485760,  # 10MB
         backupCount=5
     )
@@ -235,20 +275,960 @@ def setup_logging():
     
     return logger
 EOF
+# Add write-behind queue used to batch message inserts (enabled with WRITE_BEHIND=true)
+cat << 'EOF' > /opt/chatbot/write_behind.py
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+
+
+def is_transient(error):
+    """True for errors that retrying can fix (database unreachable, connection dropped, pool exhausted)."""
+    if getattr(error, "connection_invalidated", False):
+        return True
+    return isinstance(error, (OperationalError, InterfaceError, DisconnectionError, PoolTimeoutError))
+
+
+class WriteBehindQueue:
+    """
+    Buffers rows in memory and inserts them in batches from a background thread.
+
+    A batch is flushed when `batch_size` rows are waiting or `flush_interval` seconds
+    have passed, as one multi-row INSERT in one transaction.
+
+    A batch that fails with a transient error goes back to the head of the queue and is
+    retried after an exponential backoff (`retry_backoff` doubling up to `max_backoff`).
+    After `max_retries` failed attempts, or at once for any other error (e.g. a constraint
+    violation), its rows are inserted one at a time: rows that fail on their own are
+    dead-lettered (logged and kept in `dead_letters`) so they cannot block the rows behind
+    them. Rows still queued when the process dies, or that cannot be written within
+    `drain_timeout` seconds of stop(), are lost and logged.
+    """
+
+    def __init__(self, session_factory, model, logger, batch_size=500, flush_interval=1.0, max_queue=50000,
+                 max_retries=5, retry_backoff=0.5, max_backoff=30.0, drain_timeout=10.0, max_dead_letters=1000):
+        self.session_factory = session_factory
+        self.model = model
+        self.logger = logger
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.drain_timeout = drain_timeout
+        self.dead_letters = deque(maxlen=max_dead_letters)
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._flush_lock = threading.Lock()
+        # Failed attempts of the batch at the head of the queue, and when it may be retried (time.monotonic())
+        self._batch_failures = 0
+        self._retry_at = 0.0
+        # Metrics
+        self.rows_flushed = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.rows_dead_lettered = 0
+        self.rows_dropped = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def put(self, row):
+        with self._cond:
+            # Backpressure: block the request instead of growing the queue without bound
+            while len(self._queue) >= self.max_queue and not self._stopping:
+                self._cond.wait(self.flush_interval)
+            self._queue.append(row)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        # Drain whatever is left before the worker exits, still backing off between failed attempts
+        deadline = time.monotonic() + self.drain_timeout
+        while self._queue and time.monotonic() < deadline:
+            self.flush()
+            time.sleep(max(0.0, min(self._retry_at, deadline) - time.monotonic()))
+        with self._cond:
+            dropped = len(self._queue)
+            self._queue.clear()
+        if dropped:
+            self.rows_dropped += dropped
+            self.logger.error(f"Write-behind queue stopped with {dropped} rows not written; they are lost")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                delay = self._retry_at - time.monotonic()
+                if not self._stopping and (delay > 0 or len(self._queue) < self.batch_size):
+                    self._cond.wait(delay if delay > 0 else self.flush_interval)
+                if self._stopping:
+                    return
+                if self._retry_at > time.monotonic():
+                    # Woken by put() while backing off
+                    continue
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._cond:
+                count = min(len(self._queue), self.batch_size)
+                rows = [self._queue.popleft() for _ in range(count)]
+                self._cond.notify_all()
+            if not rows:
+                return 0
+            start = time.perf_counter()
+            try:
+                self._insert(rows)
+            except Exception as e:
+                self.flush_errors += 1
+                self._batch_failures += 1
+                if is_transient(e) and self._batch_failures < self.max_retries:
+                    self.logger.error(
+                        f"Write-behind flush of {len(rows)} rows failed (attempt {self._batch_failures}), "
+                        f"retrying in {self._backoff():.1f}s: {str(e)}"
+                    )
+                    self._requeue(rows)
+                    return 0
+                self.logger.error(f"Write-behind flush of {len(rows)} rows failed, inserting them one at a time: {str(e)}")
+                return self._flush_rows(rows)
+            self._record_flush(len(rows), time.perf_counter() - start)
+            self._batch_failures = 0
+            self._retry_at = 0.0
+            return len(rows)
+
+    def _flush_rows(self, rows):
+        """Insert rows one by one after a batch failed, dead-lettering the ones that fail on their own."""
+        written = 0
+        for index, row in enumerate(rows):
+            start = time.perf_counter()
+            try:
+                self._insert([row])
+            except Exception as e:
+                if is_transient(e):
+                    # The database went away: nothing here is the row's fault, so keep the rest for later
+                    self.logger.error(f"Write-behind flush interrupted, {len(rows) - index} rows requeued: {str(e)}")
+                    self._requeue(rows[index:])
+                    return written
+                self.rows_dead_lettered += 1
+                self.dead_letters.append({"row": row, "error": str(e)})
+                self.logger.error(f"Write-behind row dead-lettered: {str(e)}; row: {str(row)[:500]}")
+                continue
+            self._record_flush(1, time.perf_counter() - start)
+            written += 1
+        self._batch_failures = 0
+        self._retry_at = 0.0
+        return written
+
+    def _insert(self, rows):
+        db = self.session_factory()
+        try:
+            db.execute(insert(self.model), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _backoff(self):
+        return min(self.retry_backoff * 2 ** (self._batch_failures - 1), self.max_backoff)
+
+    def _requeue(self, rows):
+        # Put the rows back at the head of the queue and wait out the backoff before the next attempt
+        with self._cond:
+            self._queue.extendleft(reversed(rows))
+            self._retry_at = time.monotonic() + self._backoff()
+
+    def _record_flush(self, count, elapsed):
+        self.rows_flushed += count
+        self.flush_count += 1
+        self.last_flush_seconds = elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self.total_flush_seconds += elapsed
+
+    def stats(self):
+        return {
+            "queue_depth": len(self._queue),
+            "rows_flushed": self.rows_flushed,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "rows_dead_lettered": self.rows_dead_lettered,
+            "rows_dropped": self.rows_dropped,
+            "retrying": self._batch_failures > 0,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+            "avg_flush_seconds": self.total_flush_seconds / self.flush_count if self.flush_count else 0.0,
+        }
+EOF
+
+# Add Prometheus metrics (aggregated across gunicorn workers through PROMETHEUS_MULTIPROC_DIR)
+cat << 'EOF' > /opt/chatbot/metrics.py
+import os
+import time
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "chatbot_request_duration_seconds",
+    "Time until the response starts, by route template and status",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "chatbot_request_db_seconds",
+    "Time spent in database calls per request",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Counter("chatbot_db_queries_total", "Database statements executed", ["method", "route"])
+IN_FLIGHT = Gauge("chatbot_requests_in_flight", "Requests currently being handled", multiprocess_mode="livesum")
+
+# Per-request accumulator [seconds, statements]. The list object is shared with the worker thread
+# that runs a sync endpoint (contexts are copied, not the list), so in-place updates are visible here.
+_db_timer = ContextVar("db_timer", default=None)
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        timer = _db_timer.get()
+        if timer is not None:
+            timer[0] += elapsed
+            timer[1] += 1
+
+
+def start_request():
+    timer = [0.0, 0]
+    _db_timer.set(timer)
+    IN_FLIGHT.inc()
+    return timer
+
+
+def current_timer():
+    return _db_timer.get()
+
+
+def route_label(request):
+    # Label by route template (/history, not /history?after_id=...) to keep cardinality fixed
+    route = request.scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+def finish_request(request, status, duration):
+    IN_FLIGHT.dec()
+    REQUEST_LATENCY.labels(request.method, route_label(request), str(status)).observe(duration)
+
+
+def observe_db_time(request, timer):
+    route = route_label(request)
+    REQUEST_DB_TIME.labels(request.method, route).observe(timer[0])
+    if timer[1]:
+        DB_QUERIES.labels(request.method, route).inc(timer[1])
+
+
+async def observe_db_time_after(body_iterator, request, timer):
+    """Pass the response body through, then observe the request's DB time once it is all sent."""
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        observe_db_time(request, timer)
+
+
+def timed_rows(query, timer):
+    """
+    Iterate a streamed query, adding the time spent executing it and fetching its rows to `timer`.
+
+    Rows of a server-side cursor are fetched while the response body is sent, which the cursor
+    events do not see. The statement runs on the first fetch; its time is only added here if those
+    events did not count it (it ran in a thread that does not carry the request's context).
+    """
+    if timer is None:
+        yield from query
+        return
+    rows = iter(query)
+    first = True
+    while True:
+        statements, counted = timer[1], timer[0]
+        start = time.perf_counter()
+        try:
+            row = next(rows)
+        except StopIteration:
+            row = None
+        elapsed = time.perf_counter() - start
+        if first:
+            first = False
+            if timer[1] > statements:
+                elapsed -= timer[0] - counted
+            else:
+                timer[1] += 1
+        timer[0] += elapsed
+        if row is None:
+            return
+        yield row
+
+
+def render():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+EOF
+
+# Gunicorn hook so metrics of dead workers stop counting toward live gauges
+cat << 'EOF' > /opt/chatbot/gunicorn_conf.py
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
+EOF
+
+# Monthly range partitions for the messages table (PostgreSQL only), also run daily by chatbot-partitions.timer
+cat << 'EOF' > /opt/chatbot/partitions.py
+import argparse
+import os
+from datetime import date, datetime
+
+from sqlalchemy import BigInteger, Column, Integer, MetaData, Table, create_engine, insert, text, update
+from sqlalchemy.exc import IntegrityError
+
+# Any constant works; it only has to be the same in every process that runs maintenance
+LOCK_KEY = 7240551
+PARTITION_PREFIX = "messages_p"
+
+# One row, bumped whenever messages are removed (archive runs, detached partitions). /history
+# versions pages by max(id) and this counter, since removals leave max(id) unchanged.
+messages_version = Table(
+    "messages_version", MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("version", BigInteger, nullable=False),
+)
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS messages (
+    id SERIAL,
+    content TEXT,
+    response TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at)
+"""
+
+
+def ensure_messages_version(engine):
+    messages_version.create(engine, checkfirst=True)
+    try:
+        with engine.begin() as conn:
+            if conn.execute(messages_version.select()).first() is None:
+                conn.execute(insert(messages_version).values(id=1, version=0))
+    except IntegrityError:
+        pass  # another process seeded it first
+
+
+def bump_messages_version(conn):
+    conn.execute(update(messages_version).where(messages_version.c.id == 1).values(version=messages_version.c.version + 1))
+
+
+def add_months(day, months):
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month_start):
+    return f"{PARTITION_PREFIX}{month_start:%Y_%m}"
+
+
+def is_partitioned(conn):
+    # relkind 'p' is a partitioned table, 'r' a plain one
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('messages')")).scalar()
+
+
+def create_partitioned_table(conn, months_ahead=3, logger=None):
+    """Create the partitioned messages table and the partitions from this month to `months_ahead` on."""
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+    kind = is_partitioned(conn)
+    if kind == "r":
+        # Tables created before partitioning stay as they are, but need the column the app now writes
+        conn.execute(text(
+            "ALTER TABLE messages ADD COLUMN IF NOT EXISTS created_at TIMESTAMP NOT NULL "
+            "DEFAULT (now() AT TIME ZONE 'utc')"
+        ))
+        if logger:
+            logger.warning("messages is a plain table; it is not partitioned or rotated")
+        return []
+    if kind is None:
+        conn.execute(text(CREATE_TABLE))
+        # Index per partition; /history pages by id and the ETag reads max(id)
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_messages_id ON messages (id)"))
+    return ensure_partitions(conn, months_ahead)
+
+
+def ensure_partitions(conn, months_ahead):
+    created = []
+    this_month = date.today().replace(day=1)
+    for offset in range(months_ahead + 1):
+        start = add_months(this_month, offset)
+        name = partition_name(start)
+        exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+        if exists is None:
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF messages "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{add_months(start, 1).isoformat()}')"
+            ))
+            created.append(name)
+    return created
+
+
+def attached_partitions(conn):
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'messages'::regclass ORDER BY c.relname"
+    ))
+    return [name for (name,) in rows if name.startswith(PARTITION_PREFIX)]
+
+
+def detach_expired(engine, retention_months, drop=False):
+    """
+    Detach partitions whose month ended more than `retention_months` months ago.
+    Detached tables are kept for archiving unless `drop` is set.
+    """
+    cutoff = add_months(date.today().replace(day=1), -retention_months)
+    with engine.begin() as conn:
+        expired = [
+            name for name in attached_partitions(conn)
+            if add_months(datetime.strptime(name[len(PARTITION_PREFIX):], "%Y_%m").date(), 1) <= cutoff
+        ]
+    # DETACH ... CONCURRENTLY does not block inserts but cannot run inside a transaction block.
+    # The version is bumped after each detach, so no reader can cache a version that still has the rows.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in expired:
+            conn.execute(text(f"ALTER TABLE messages DETACH PARTITION {name} CONCURRENTLY"))
+            bump_messages_version(conn)
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+    return expired
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create upcoming and detach expired messages partitions")
+    parser.add_argument("--months-ahead", type=int, default=int(os.getenv("PARTITION_MONTHS_AHEAD", "3")))
+    parser.add_argument("--retention-months", type=int, default=int(os.getenv("PARTITION_RETENTION_MONTHS", "12")))
+    parser.add_argument("--drop", action="store_true", help="drop detached partitions instead of keeping them")
+    args = parser.parse_args()
+
+    url = os.getenv("DATABASE_URL") or (
+        f"postgresql://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}"
+        f"@{os.getenv('DB_PRIMARY_HOST') or os.getenv('DB_HOST')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_DBNAME')}"
+    )
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        created = create_partitioned_table(conn, args.months_ahead)
+    ensure_messages_version(engine)
+    detached = detach_expired(engine, args.retention_months, args.drop)
+    print(f"created: {created or 'none'}; {'dropped' if args.drop else 'detached'}: {detached or 'none'}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
+EOF
+
+# Archive old messages to S3 as date-partitioned zstd NDJSON (or Parquet), run daily by chatbot-archive.timer
+cat << 'EOF' > /opt/chatbot/archive.py
+import argparse
+import io
+import os
+import time
+from datetime import datetime, timedelta
+from itertools import groupby
+
+import orjson
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, Text, create_engine, delete, select
+
+from partitions import bump_messages_version, ensure_messages_version
+
+metadata = MetaData()
+messages = Table(
+    "messages", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("content", Text),
+    Column("response", Text),
+    Column("created_at", DateTime),
+)
+
+# Plain str keys for the archived records (Table column keys are a str subclass that orjson rejects)
+COLUMNS = ("id", "content", "response", "created_at")
+PART_SIZE = 8 * 1024 * 1024  # S3 multipart parts must be at least 5 MiB, except the last one
+
+
+class MultipartUpload(io.RawIOBase):
+    """Write-only file object that uploads to S3 in fixed-size parts, so memory stays at one part."""
+
+    def __init__(self, s3, bucket, key, part_size=PART_SIZE):
+        self.s3, self.bucket, self.key, self.part_size = s3, bucket, key, part_size
+        self.upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+        self.parts = []
+        self.buffer = bytearray()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.buffer += data
+        self.size += len(data)
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+        return len(data)
+
+    def _upload_part(self):
+        number = len(self.parts) + 1
+        etag = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, PartNumber=number, Body=bytes(self.buffer)
+        )["ETag"]
+        self.parts.append({"ETag": etag, "PartNumber": number})
+        self.buffer.clear()
+
+    def complete(self):
+        if self.buffer or not self.parts:
+            self._upload_part()
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self.upload_id, MultipartUpload={"Parts": self.parts}
+        )
+
+    def abort(self):
+        self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+class NdjsonZstdWriter:
+    extension = "ndjson.zst"
+
+    def __init__(self, upload):
+        import zstandard
+
+        self.stream = zstandard.ZstdCompressor(level=10).stream_writer(upload, closefd=False)
+
+    def write_rows(self, rows):
+        self.stream.write(b"".join(orjson.dumps(row) + b"\n" for row in rows))
+
+    def close(self):
+        self.stream.close()
+
+
+class ParquetWriter:
+    extension = "parquet"
+
+    def __init__(self, upload):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ("id", pa.int64()), ("content", pa.string()), ("response", pa.string()), ("created_at", pa.timestamp("us")),
+        ])
+        self.writer = pq.ParquetWriter(upload, self.schema, compression="zstd")
+
+    def write_rows(self, rows):
+        # One row group per fetched batch
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {"ndjson": NdjsonZstdWriter, "parquet": ParquetWriter}
+
+
+def archive_messages(engine, s3, bucket, cutoff, prefix="messages", fmt="ndjson", batch_size=5000, logger=None):
+    """
+    Move messages created before `cutoff` to s3://bucket/prefix/dt=YYYY-MM-DD/.
+
+    Rows are read oldest first through a server-side cursor `batch_size` at a time and streamed
+    into one object per day, so memory does not grow with the number of rows. Rows are deleted
+    only after every object is uploaded, in batches of `batch_size`, bounded by the highest id
+    written for each day. Returns a list of (key, rows) for the uploaded objects.
+    """
+    writer_class = WRITERS[fmt]
+    run_id = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    uploaded = []  # (key, rows, day, max_id) per object
+    day = upload = writer = None
+    count = max_id = 0
+
+    def finish():
+        writer.close()
+        upload.complete()
+        uploaded.append((upload.key, count, day, max_id))
+        if logger:
+            logger.info(f"Archived {count} messages to s3://{bucket}/{upload.key} ({upload.size} bytes)")
+
+    query = select(messages).where(messages.c.created_at < cutoff).order_by(messages.c.created_at, messages.c.id)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        try:
+            for partition in result.partitions():
+                # Rows arrive in created_at order, so each day is one contiguous run
+                for row_day, rows in groupby(partition, key=lambda row: row.created_at.date()):
+                    if row_day != day:
+                        if writer is not None:
+                            finish()
+                            writer = None
+                        day, count, max_id = row_day, 0, 0
+                        key = f"{prefix}/dt={day.isoformat()}/{run_id}.{writer_class.extension}"
+                        upload = MultipartUpload(s3, bucket, key)
+                        writer = writer_class(upload)
+                    chunk = [dict(zip(COLUMNS, row)) for row in rows]
+                    writer.write_rows(chunk)
+                    count += len(chunk)
+                    max_id = max(max_id, max(row["id"] for row in chunk))
+            if writer is not None:
+                finish()
+                writer = None
+        except Exception:
+            if writer is not None:
+                upload.abort()
+            raise
+
+    ensure_messages_version(engine)
+    for key, rows, archived_day, last_id in uploaded:
+        day_start = datetime.combine(archived_day, datetime.min.time())
+        day_end = min(day_start + timedelta(days=1), cutoff)
+        deleted = delete_in_batches(engine, day_start, day_end, last_id, batch_size)
+        if logger:
+            logger.info(f"Deleted {deleted} archived messages for {archived_day}")
+    return [(key, rows) for key, rows, _, _ in uploaded]
+
+
+def delete_in_batches(engine, start, end, max_id, batch_size):
+    # Short transactions keep row locks and WAL bursts small while the app keeps writing
+    total = 0
+    while True:
+        ids = (
+            select(messages.c.id)
+            .where(messages.c.created_at >= start, messages.c.created_at < end, messages.c.id <= max_id)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        with engine.begin() as conn:
+            deleted = conn.execute(delete(messages).where(messages.c.id.in_(ids))).rowcount
+            if deleted:
+                # Same transaction, so /history's ETag changes exactly when the rows disappear
+                bump_messages_version(conn)
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+def main():
+    import boto3
+
+    from logging_config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Move old chat messages to S3")
+    parser.add_argument("--bucket", default=os.getenv("ARCHIVE_BUCKET"))
+    parser.add_argument("--prefix", default=os.getenv("ARCHIVE_PREFIX", "messages"))
+    parser.add_argument("--older-than-days", type=int, default=int(os.getenv("ARCHIVE_AFTER_DAYS", "90")))
+    parser.add_argument("--format", choices=sorted(WRITERS), default=os.getenv("ARCHIVE_FORMAT", "ndjson"))
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("ARCHIVE_BATCH_SIZE", "5000")))
+    args = parser.parse_args()
+    if not args.bucket:
+        parser.error("--bucket or ARCHIVE_BUCKET is required")
+
+    logger = setup_logging()
+    url = os.getenv("DATABASE_URL") or (
+        f"postgresql://{os.getenv('DB_USERNAME')}:{os.getenv('DB_PASSWORD')}"
+        f"@{os.getenv('DB_PRIMARY_HOST') or os.getenv('DB_HOST')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_DBNAME')}"
+    )
+    engine = create_engine(url)
+    s3 = boto3.client("s3", region_name=os.getenv("AWS_REGION", "eu-west-2"))
+    cutoff = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=args.older_than_days)
+    start = time.perf_counter()
+    objects = archive_messages(engine, s3, args.bucket, cutoff, args.prefix, args.format, args.batch_size, logger)
+    logger.info(
+        f"Archive before {cutoff.isoformat()} finished: {sum(rows for _, rows in objects)} messages "
+        f"in {len(objects)} objects, {time.perf_counter() - start:.1f}s"
+    )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
+EOF
+
+# Read/write routing between the primary and the read replicas (DB_REPLICA_HOSTS)
+cat << 'EOF' > /opt/chatbot/db_routing.py
+import itertools
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+
+class ReplicaPool:
+    """
+    Round-robin over replica engines. A replica whose connection fails is skipped for
+    `retry_after` seconds, and reads go to the primary while no replica is available.
+    """
+
+    def __init__(self, engines, retry_after=30.0, logger=None):
+        self.engines = list(engines)
+        self.retry_after = retry_after
+        self.logger = logger
+        self._down_until = {}
+        self._cycle = itertools.cycle(self.engines)
+        self._lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self._on_error)
+
+    def __bool__(self):
+        return bool(self.engines)
+
+    def _on_error(self, context):
+        # Only connection-level failures (refused, reset, replica restarting) take a replica out
+        if context.is_disconnect or context.connection is None:
+            self.mark_down(context.engine)
+
+    def mark_down(self, engine):
+        with self._lock:
+            self._down_until[engine] = time.monotonic() + self.retry_after
+        if self.logger:
+            self.logger.warning(f"Read replica {engine.url.host} unavailable, using the primary for {self.retry_after:.0f}s")
+
+    def pick(self):
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.engines)):
+                engine = next(self._cycle)
+                if self._down_until.get(engine, 0) <= now:
+                    return engine
+        return None
+
+
+class RoutingSession(Session):
+    """
+    Session that sends SELECTs to one replica, picked on first use and kept for the session's
+    lifetime, and everything else (flushes, bulk inserts, INSERT/UPDATE/DELETE, raw SQL) to the
+    primary. Pass use_primary=True (e.g. right after the client wrote) to read from the primary, or
+    replica=<engine from ReplicaPool.pick()> so several sessions of one request read the same replica.
+    """
+
+    def __init__(self, primary, replicas, use_primary=False, replica=None, **kwargs):
+        super().__init__(**kwargs)
+        self.primary = primary
+        self.replicas = replicas
+        self.use_primary = use_primary
+        self.replica = replica
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.use_primary or self._flushing or not isinstance(clause, Select):
+            return self.primary
+        if self.replica is None:
+            self.replica = self.replicas.pick()
+            if self.replica is None:
+                return self.primary
+        return self.replica
+EOF
+
+# Cached SSM/Secrets Manager configuration, refreshed in the background so credentials can rotate without a reboot
+cat << 'EOF' > /opt/chatbot/config_client.py
+import json
+import threading
+import time
+
+from sqlalchemy import event
+
+
+class SsmParameterSource:
+    """Every parameter under an SSM path (e.g. /chatbot/db), keyed by the last part of its name."""
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+
+    def load(self):
+        values = {}
+        paginator = self.client.get_paginator("get_parameters_by_path")
+        for page in paginator.paginate(Path=self.path, WithDecryption=True, Recursive=True):
+            for param in page["Parameters"]:
+                values[param["Name"].split("/")[-1]] = param["Value"]
+        return values
+
+
+class SecretsManagerSource:
+    """The key/value pairs of a JSON secret, as written by create_secrets_with_kms."""
+
+    def __init__(self, client, secret_id):
+        self.client = client
+        self.secret_id = secret_id
+
+    def load(self):
+        return json.loads(self.client.get_secret_value(SecretId=self.secret_id)["SecretString"])
+
+
+class ConfigClient:
+    """
+    Cached values from a source, reloaded `refresh_ahead` seconds before they expire.
+
+    Reads are served from memory. Once start() is called a background thread does the reloads,
+    so requests never wait on AWS; without it, or while reloads keep failing, a read after the
+    TTL reloads inline. A failed reload keeps the last known values. Callbacks registered with
+    on_change(callback) get (old, new) whenever a reload returns different values.
+    """
+
+    def __init__(self, source, ttl=300.0, refresh_ahead=60.0, retry_interval=10.0, initial=None, logger=None):
+        self.source = source
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.retry_interval = retry_interval
+        self.logger = logger
+        # Values known before the first load (e.g. from the environment), used if that load fails
+        self._values = dict(initial) if initial is not None else None
+        self._expires_at = 0.0
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.loads = 0
+
+    def on_change(self, callback):
+        self._callbacks.append(callback)
+
+    def values(self):
+        if self._values is None or time.monotonic() >= self._expires_at:
+            try:
+                self.refresh()
+            except Exception as e:
+                if self._values is None:
+                    raise
+                if self.logger:
+                    self.logger.warning(f"Config refresh failed, using cached values: {e}")
+        return self._values
+
+    def get(self, key, default=None):
+        return self.values().get(key, default)
+
+    def refresh(self):
+        values = self.source.load()
+        with self._lock:
+            old, self._values = self._values, values
+            self._expires_at = time.monotonic() + self.ttl
+            self.loads += 1
+        if old is not None and values != old:
+            changed = sorted(key for key in values.keys() | old.keys() if values.get(key) != old.get(key))
+            if self.logger:
+                self.logger.info(f"Config changed: {', '.join(changed)}")
+            for callback in self._callbacks:
+                try:
+                    callback(old, values)
+                except Exception:
+                    if self.logger:
+                        self.logger.exception("Config change callback failed")
+        return values
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="config-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self._expires_at - self.refresh_ahead - time.monotonic()
+            if self._stop.wait(max(delay, 0)):
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Background config refresh failed: {e}")
+                self._stop.wait(self.retry_interval)
+
+
+def bind_engine(engine, config, fields):
+    """
+    Open new connections of `engine` with the current config values. `fields` maps DBAPI
+    connect() arguments to config keys, e.g. {"user": "username", "password": "password"}.
+
+    When one of those values changes the engine's pool is replaced: idle connections are
+    closed, checked-out ones finish their work and are closed when returned, and every
+    new connection uses the new values.
+    """
+    @event.listens_for(engine, "do_connect")
+    def use_current_values(dialect, conn_rec, cargs, cparams):
+        values = config.values()
+        for param, key in fields.items():
+            if values.get(key):
+                cparams[param] = values[key]
+
+    def dispose_on_change(old, new):
+        if any(old.get(key) != new.get(key) for key in fields.values()):
+            engine.dispose()
+
+    config.on_change(dispose_on_change)
+EOF
+
 # Clone the application repository (in a real scenario)
 # git clone https://github.com/your-username/fastapi-chatbot.git /opt/chatbot
 
-# Copy application code
-cat <<EOF > /opt/chatbot/main.py
-from fastapi import FastAPI, HTTPException, Depends, Request
+# Copy application code (quoted heredoc so the Python source is written verbatim)
+cat << 'EOF' > /opt/chatbot/main.py
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Integer, String, Text
+from sqlalchemy import create_engine, func, insert, make_url, select, Column, DateTime, Integer, String, Text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
+from datetime import datetime
+from typing import List, Optional
+import asyncio
+import json
+import orjson
 import os
 import time
 from logging_config import setup_logging
+from write_behind import WriteBehindQueue
+import metrics
+import partitions
+from db_routing import ReplicaPool, RoutingSession
+from config_client import ConfigClient, SsmParameterSource, bind_engine
 
 # Setup logging
 logger = setup_logging()
@@ -260,11 +1240,86 @@ DB_DBNAME = os.getenv("DB_DBNAME")
 DB_USERNAME = os.getenv("DB_USERNAME")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 
-DATABASE_URL = f"postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DBNAME}"
+# Connection pooler in front of the primary: "none", "rds_proxy" (DB_HOST is the proxy endpoint)
+# or "pgbouncer" (local PgBouncer in transaction mode at PGBOUNCER_HOST:PGBOUNCER_PORT)
+DB_POOLER = os.getenv("DB_POOLER", "none")
+PGBOUNCER_HOST = os.getenv("PGBOUNCER_HOST", "127.0.0.1")
+PGBOUNCER_PORT = os.getenv("PGBOUNCER_PORT", "6432")
+
+# DATABASE_URL overrides the DB_* settings (e.g. sqlite:///chatbot.db for local runs and benchmarks)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DBNAME}"
+
+
+def primary_engine_options():
+    """Pool settings for the primary, matched to whatever already pools connections in front of it."""
+    if DB_POOLER == "pgbouncer":
+        # PgBouncer is the pool; connecting to it over loopback is cheap, so each
+        # request opens and closes its own client connection
+        return {"poolclass": NullPool}
+    if DB_POOLER == "rds_proxy":
+        # Keep a few TLS connections to the proxy per worker and replace them before the
+        # proxy's idle client timeout (30 minutes) closes them
+        return {
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "2")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "3")),
+            "pool_recycle": 900,
+            "pool_pre_ping": True,
+            "connect_args": {"sslmode": "require"},
+        }
+    return {}
+
 
 # SQLAlchemy setup
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if DB_POOLER == "pgbouncer" and not os.getenv("DATABASE_URL"):
+    engine = create_engine(
+        f"postgresql://{DB_USERNAME}:{DB_PASSWORD}@{PGBOUNCER_HOST}:{PGBOUNCER_PORT}/{DB_DBNAME}",
+        **primary_engine_options(),
+    )
+else:
+    engine = create_engine(DATABASE_URL, **primary_engine_options())
+metrics.instrument_engine(engine)
+
+# Read replicas (comma-separated hosts from the replica_hosts SSM parameter). Reads use a replica unless
+# none is reachable or the client wrote within READ_YOUR_WRITES_SECONDS; writes always use the primary.
+DB_REPLICA_HOSTS = [host for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host]
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "chatbot_wrote_until"
+replica_engines = [
+    # Replicas are always reached directly, not through the pooler in front of the primary
+    create_engine(make_url(DATABASE_URL).set(host=host), pool_pre_ping=True) for host in DB_REPLICA_HOSTS
+]
+for replica_engine in replica_engines:
+    metrics.instrument_engine(replica_engine)
+replicas = ReplicaPool(
+    replica_engines, retry_after=float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30")), logger=logger
+)
+
+# The SSM path get_secrets.py reads at boot (DB_PARAM_PATH), cached for CONFIG_TTL_SECONDS and reloaded in
+# the background. New connections use the latest values, so a rotated password or a new host is picked
+# up without restarting the service.
+DB_PARAM_PATH = os.getenv("DB_PARAM_PATH")
+config = None
+if DB_PARAM_PATH and not os.getenv("DATABASE_URL"):
+    import boto3
+
+    config = ConfigClient(
+        SsmParameterSource(boto3.client("ssm", region_name=os.getenv("AWS_REGION", "eu-west-2")), DB_PARAM_PATH),
+        ttl=float(os.getenv("CONFIG_TTL_SECONDS", "300")),
+        refresh_ahead=float(os.getenv("CONFIG_REFRESH_AHEAD_SECONDS", "60")),
+        initial={"username": DB_USERNAME, "password": DB_PASSWORD, "host": DB_HOST, "port": DB_PORT, "dbname": DB_DBNAME},
+        logger=logger,
+    )
+    credentials = {"user": "username", "password": "password", "dbname": "dbname"}
+    if DB_POOLER == "pgbouncer":
+        # The app logs in to the local PgBouncer with the userlist written at boot
+        logger.info("Connections to the primary go through PgBouncer; credential changes apply after a reboot")
+    else:
+        bind_engine(engine, config, {**credentials, "host": "host", "port": "port"})
+    for replica_engine in replica_engines:
+        bind_engine(replica_engine, config, credentials)
+SessionLocal = sessionmaker(
+    class_=RoutingSession, primary=engine, replicas=replicas, autocommit=False, autoflush=False
+)
 Base = declarative_base()
 
 # Define database models
@@ -274,9 +1329,35 @@ class MessageRecord(Base):
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
     response = Column(Text)
-
-# Create tables
+    # Partition key on PostgreSQL, where the primary key is (id, created_at)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+# Create tables. On PostgreSQL messages is range-partitioned by month (partitions.py), so it is created
+# there together with this month's and the next few months' partitions; create_all then skips it.
+if engine.dialect.name == "postgresql":
+    with engine.begin() as conn:
+        created = partitions.create_partitioned_table(
+            conn, int(os.getenv("PARTITION_MONTHS_AHEAD", "3")), logger
+        )
+    if created:
+        logger.info(f"Created message partitions: {created}")
 Base.metadata.create_all(bind=engine)
+partitions.ensure_messages_version(engine)
+
+# Optional write-behind mode: /chat queues messages and a background thread inserts them in batches
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+write_behind = None
+if WRITE_BEHIND:
+    write_behind = WriteBehindQueue(
+        SessionLocal,
+        MessageRecord,
+        logger,
+        batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1.0")),
+        max_queue=int(os.getenv("WRITE_BEHIND_MAX_QUEUE", "50000")),
+        max_retries=int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5")),
+        drain_timeout=float(os.getenv("WRITE_BEHIND_DRAIN_TIMEOUT", "10")),
+    )
 
 # FastAPI models
 class Message(BaseModel):
@@ -285,6 +1366,15 @@ class Message(BaseModel):
 class ChatResponse(BaseModel):
     response: str
 
+class BatchChatRequest(BaseModel):
+    messages: List[Message]
+
+class BatchChatResponse(BaseModel):
+    responses: List[ChatResponse]
+
+# Upper bound on messages per /chat/batch request, so one request cannot hold a transaction open for long
+CHAT_BATCH_MAX_MESSAGES = int(os.getenv("CHAT_BATCH_MAX_MESSAGES", "1000"))
+
 app = FastAPI(title="Chatbot API")
 
 # Add CORS middleware
@@ -296,15 +1386,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Add request logging middleware
+@app.on_event("startup")
+def start_write_behind():
+    if write_behind is not None:
+        write_behind.start()
+        logger.info("Write-behind mode enabled")
+
+@app.on_event("startup")
+def start_config_refresh():
+    if config is not None:
+        config.start()
+
+@app.on_event("shutdown")
+def stop_config_refresh():
+    if config is not None:
+        config.stop()
+
+@app.on_event("shutdown")
+def stop_write_behind():
+    # Flush pending messages on graceful shutdown (gunicorn sends SIGTERM to each worker)
+    if write_behind is not None:
+        write_behind.stop()
+        logger.info(f"Write-behind queue drained: {write_behind.stats()}")
+
+# Add request logging and metrics middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    logger.info(f"{request.method} {request.url.path} - Status: {response.status_code} - Duration: {process_time:.4f}s")
+    db_timer = metrics.start_request()
+    status = 500
+    response = None
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        process_time = time.time() - start_time
+        metrics.finish_request(request, status, process_time)
+        if response is None:
+            metrics.observe_db_time(request, db_timer)
+    # DB time is observed after the body is sent, since /history reads its rows while streaming
+    response.body_iterator = metrics.observe_db_time_after(response.body_iterator, request, db_timer)
+    if replicas and request.method == "POST" and status < 400:
+        # Read-your-writes: this client's reads go to the primary until replicas have caught up
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}",
+            max_age=int(READ_YOUR_WRITES_SECONDS) + 1, httponly=True,
+        )
+    logger.info(f"{request.method} {request.url.path} - Status: {response.status_code} - Duration: {process_time:.4f}s - DB: {db_timer[0]:.4f}s")
     return response
 
+def wrote_recently(request):
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, "0")) > time.time()
+    except ValueError:
+        return False
+
 # Dependency to get the database session
 def get_db():
     db = SessionLocal()
@@ -324,7 +1460,11 @@ def chat(message: Message, db: Session = Depends(get_db)):
 
     # Simple echo response for now
     response = f"You said: {message.content}"
-    
+
+    if write_behind is not None:
+        write_behind.put({"content": message.content, "response": response})
+        return ChatResponse(response=response)
+
     # Store message in database
     try:
         db_message = MessageRecord(content=message.content, response=response)
@@ -338,16 +1478,285 @@ def chat(message: Message, db: Session = Depends(get_db)):
     
     return ChatResponse(response=response)
 
+@app.post("/chat/batch", response_model=BatchChatResponse)
+def chat_batch(batch: BatchChatRequest, db: Session = Depends(get_db)):
+    if not 1 <= len(batch.messages) <= CHAT_BATCH_MAX_MESSAGES:
+        raise HTTPException(status_code=422, detail=f"messages must contain 1 to {CHAT_BATCH_MAX_MESSAGES} items")
+    logger.info(f"Batch chat request received with {len(batch.messages)} messages")
+
+    rows = [{"content": m.content, "response": f"You said: {m.content}"} for m in batch.messages]
+    responses = [ChatResponse(response=row["response"]) for row in rows]
+
+    if write_behind is not None:
+        for row in rows:
+            write_behind.put(row)
+        return BatchChatResponse(responses=responses)
+
+    # A list of parameter sets is sent as multi-row INSERT ... VALUES statements in one transaction
+    try:
+        db.execute(insert(MessageRecord), rows)
+        db.commit()
+        logger.info(f"Batch of {len(rows)} messages saved to database")
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Database error")
+
+    return BatchChatResponse(responses=responses)
+
+def reply_tokens(content):
+    # Simple echo response split into words, standing in for a model that streams tokens
+    words = f"You said: {content}".split(" ")
+    yield words[0]
+    for word in words[1:]:
+        yield " " + word
+
+def sse_event(data, event=None):
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+@app.post("/chat/stream")
+def chat_stream(message: Message):
+    logger.info(f"Streaming chat request received with content: {message.content}")
+
+    # Server-Sent Events: one `data` event per token, then a `done` event with the full reply
+    def events():
+        tokens = []
+        for token in reply_tokens(message.content):
+            tokens.append(token)
+            yield sse_event({"token": token})
+        response = "".join(tokens)
+
+        # Store the message once the reply is complete
+        if write_behind is not None:
+            write_behind.put({"content": message.content, "response": response})
+        else:
+            db = SessionLocal()
+            try:
+                db.add(MessageRecord(content=message.content, response=response))
+                db.commit()
+            except Exception as e:
+                logger.error(f"Database error: {str(e)}")
+                db.rollback()
+                yield sse_event({"detail": "Database error"}, event="error")
+                return
+            finally:
+                db.close()
+        yield sse_event({"response": response}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# WebSocket chat settings. The heartbeat must stay below the ALB idle timeout (albIdleTimeout in Pulumi config)
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "30"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "300"))
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "32"))
+
+def save_message(db, content, response):
+    if write_behind is not None:
+        write_behind.put({"content": content, "response": response})
+        return True
+    try:
+        db.add(MessageRecord(content=content, response=response))
+        db.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        db.rollback()
+        return False
+
+@app.websocket("/ws/chat/{session_id}")
+async def chat_websocket(websocket: WebSocket, session_id: str):
+    """
+    Chat over one connection: the client sends {"content": "..."} and receives
+    {"type": "reply", "response": "..."} in order. The server sends {"type": "ping"}
+    every WS_HEARTBEAT_INTERVAL seconds and closes the socket after WS_IDLE_TIMEOUT
+    seconds without a chat message.
+    """
+    await websocket.accept()
+    logger.info(f"WebSocket session {session_id} opened")
+    # One session for the whole conversation; it only holds a pool connection while committing
+    db = SessionLocal()
+    # Bounded inbox: when it is full the reader stops pulling frames, so TCP flow control slows the client
+    inbox = asyncio.Queue(maxsize=WS_MAX_PENDING)
+    send_lock = asyncio.Lock()
+
+    async def send(payload):
+        async with send_lock:
+            await websocket.send_text(orjson.dumps(payload).decode())
+
+    async def receive_loop():
+        while True:
+            await inbox.put(await websocket.receive_text())
+
+    async def heartbeat_loop():
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_INTERVAL)
+            await send({"type": "ping"})
+
+    async def chat_loop():
+        loop = asyncio.get_running_loop()
+        last_message = loop.time()
+        while True:
+            remaining = WS_IDLE_TIMEOUT - (loop.time() - last_message)
+            try:
+                raw = await asyncio.wait_for(inbox.get(), timeout=max(remaining, 0))
+            except asyncio.TimeoutError:
+                logger.info(f"WebSocket session {session_id} idle, closing")
+                await websocket.close(code=1000, reason="idle timeout")
+                return
+            try:
+                data = orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                await send({"type": "error", "detail": "Invalid JSON"})
+                continue
+            if not isinstance(data, dict) or data.get("type") == "pong":
+                continue
+            content = data.get("content")
+            if not isinstance(content, str):
+                await send({"type": "error", "detail": "content must be a string"})
+                continue
+            last_message = loop.time()
+            response = f"You said: {content}"
+            # Blocking DB work runs in the threadpool, one message at a time per connection
+            if await run_in_threadpool(save_message, db, content, response):
+                await send({"type": "reply", "response": response})
+            else:
+                await send({"type": "error", "detail": "Database error"})
+
+    tasks = [asyncio.create_task(loop()) for loop in (receive_loop, heartbeat_loop, chat_loop)]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                logger.error(f"WebSocket session {session_id} failed: {str(error)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await run_in_threadpool(db.close)
+        logger.info(f"WebSocket session {session_id} closed")
+
+# Rows fetched per round trip from the server-side cursor while streaming /history
+HISTORY_FETCH_SIZE = 500
+
+def encode_history_chunk(rows, ndjson, first):
+    if ndjson:
+        return b"\n".join(rows) + b"\n"
+    return (b"" if first else b",") + b",".join(rows)
+
+def history_session(replica):
+    # replica=None reads from the primary
+    return SessionLocal(use_primary=replica is None, replica=replica)
+
+def stream_history(after_id, limit, ndjson, since=None, replica=None, db_timer=None):
+    # Uses its own session so the cursor stays open for the whole response body
+    db = history_session(replica)
+    try:
+        query = db.query(MessageRecord.id, MessageRecord.content, MessageRecord.response).filter(
+            MessageRecord.id > after_id
+        )
+        if since is not None:
+            # A bound on the partition key lets PostgreSQL skip every partition older than `since`
+            query = query.filter(MessageRecord.created_at >= since)
+        query = (
+            query.order_by(MessageRecord.id)
+            .limit(limit)
+            .execution_options(stream_results=True, yield_per=HISTORY_FETCH_SIZE)
+        )
+        if not ndjson:
+            yield '{"history":['
+        count, last_id, chunk = 0, None, []
+        for row in metrics.timed_rows(query, db_timer):
+            chunk.append(orjson.dumps({"id": row.id, "content": row.content, "response": row.response}))
+            last_id = row.id
+            if len(chunk) == HISTORY_FETCH_SIZE:
+                yield encode_history_chunk(chunk, ndjson, count == 0)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            yield encode_history_chunk(chunk, ndjson, count == 0)
+            count += len(chunk)
+        logger.info(f"Streamed {count} messages from database")
+        if not ndjson:
+            # A full page means there may be more rows; pass this back as after_id
+            next_after_id = last_id if count == limit else None
+            yield '],"next_after_id":' + json.dumps(next_after_id) + '}'
+    except Exception as e:
+        # Headers are already sent, so a truncated body is the only signal left to the client
+        logger.error(f"Database error when streaming history: {str(e)}")
+    finally:
+        db.close()
+
+def history_version(replica):
+    # (newest id, removals counter) in one round trip
+    db = history_session(replica)
+    try:
+        removals = (
+            select(partitions.messages_version.c.version)
+            .where(partitions.messages_version.c.id == 1)
+            .scalar_subquery()
+        )
+        latest_id, version = db.query(func.max(MessageRecord.id), removals).one()
+        return latest_id or 0, version or 0
+    finally:
+        db.close()
+
 @app.get("/history")
-def get_history(db: Session = Depends(get_db)):
-    logger.info("History endpoint accessed")
+def get_history(
+    request: Request,
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=10000),
+    format: str = Query("json", regex="^(json|ndjson)$"),
+    since: Optional[datetime] = None,
+):
+    logger.info(f"History endpoint accessed (after_id={after_id}, limit={limit}, format={format}, since={since})")
+    # New messages raise the newest id (an index-only lookup) and removals by the archive job or a
+    # detached partition bump messages_version, so together they version every page and are the
+    # same for all workers. Polling clients get a 304 until a message is stored or removed.
+    # The session is closed before streaming starts so a request never holds two pool connections.
+    # Both sessions read the same replica, picked once here, so the ETag never comes from a replica
+    # that is ahead of the one the body is read from.
+    replica = None if wrote_recently(request) else replicas.pick()
     try:
-        messages = db.query(MessageRecord).all()
-        logger.info(f"Retrieved {len(messages)} messages from database")
-        return {"history": [{"content": msg.content, "response": msg.response} for msg in messages]}
+        try:
+            latest_id, version = history_version(replica)
+        except OperationalError as e:
+            if replica is None:
+                raise
+            # The failed replica is now skipped; this lookup and the stream below use the primary
+            logger.warning(f"Read replica error, retrying on the primary: {str(e)}")
+            replica = None
+            latest_id, version = history_version(replica)
     except Exception as e:
-        logger.error(f"Database error when retrieving history: {str(e)}")
+        logger.error(f"Database error when retrieving history version: {str(e)}")
         raise HTTPException(status_code=500, detail="Database error")
+    etag = f'"v{latest_id}.{version}-{after_id}-{limit}-{format}-{since.isoformat() if since else ""}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    ndjson = format == "ndjson"
+    return StreamingResponse(
+        stream_history(after_id, limit, ndjson, since, replica, metrics.current_timer()),
+        media_type="application/x-ndjson" if ndjson else "application/json",
+        headers=headers,
+    )
+
+@app.get("/metrics")
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/metrics/write-behind")
+def write_behind_metrics():
+    if write_behind is None:
+        return {"enabled": False}
+    return {"enabled": True, **write_behind.stats()}
 
 @app.get("/health")
 def health_check():
@@ -459,19 +1868,94 @@ EOF
 cat <<EOF > /etc/systemd/system/chatbot.service
 [Unit]
 Description=Chatbot FastAPI application
-After=network.target
+After=network.target pgbouncer.service
 
 [Service]
 User=ec2-user
 WorkingDirectory=/opt/chatbot
 EnvironmentFile=/etc/profile.d/db_env.sh
-ExecStart=/usr/local/bin/gunicorn -w 4 -k uvicorn.workers.UvicornWorker main:app -b 0.0.0.0:8000
+Environment=DB_POOLER=${DB_POOLER}
+Environment=DB_PARAM_PATH=${DB_PARAM_PATH}
+Environment=CONFIG_TTL_SECONDS=300
+Environment=CONFIG_REFRESH_AHEAD_SECONDS=60
+Environment=WRITE_BEHIND=false
+Environment=WRITE_BEHIND_BATCH_SIZE=500
+Environment=WRITE_BEHIND_FLUSH_INTERVAL=1.0
+Environment=WRITE_BEHIND_MAX_RETRIES=5
+Environment=WRITE_BEHIND_DRAIN_TIMEOUT=10
+Environment=WS_HEARTBEAT_INTERVAL=30
+Environment=WS_IDLE_TIMEOUT=300
+Environment=PROMETHEUS_MULTIPROC_DIR=/opt/chatbot/prometheus
+# Start each run with an empty metrics directory
+ExecStartPre=/bin/rm -rf /opt/chatbot/prometheus
+ExecStartPre=/bin/mkdir -p /opt/chatbot/prometheus
+ExecStart=/usr/local/bin/gunicorn -c /opt/chatbot/gunicorn_conf.py -w 4 -k uvicorn.workers.UvicornWorker main:app -b 0.0.0.0:8000
 Restart=always
 
 [Install]
 WantedBy=multi-user.target
 EOF
 
+# Pre-create upcoming message partitions and detach expired ones once a day
+cat <<EOF > /etc/systemd/system/chatbot-partitions.service
+[Unit]
+Description=Rotate chatbot message partitions
+After=network.target
+
+[Service]
+Type=oneshot
+User=ec2-user
+WorkingDirectory=/opt/chatbot
+EnvironmentFile=/etc/profile.d/db_env.sh
+Environment=PARTITION_MONTHS_AHEAD=3
+Environment=PARTITION_RETENTION_MONTHS=12
+ExecStart=/usr/bin/python3 /opt/chatbot/partitions.py
+EOF
+
+cat <<EOF > /etc/systemd/system/chatbot-partitions.timer
+[Unit]
+Description=Daily chatbot message partition rotation
+
+[Timer]
+OnCalendar=daily
+RandomizedDelaySec=1h
+Persistent=true
+
+[Install]
+WantedBy=timers.target
+EOF
+
+# Move messages older than ARCHIVE_AFTER_DAYS to the archive bucket once a day
+cat <<EOF > /etc/systemd/system/chatbot-archive.service
+[Unit]
+Description=Archive old chatbot messages to S3
+After=network.target
+
+[Service]
+Type=oneshot
+User=ec2-user
+WorkingDirectory=/opt/chatbot
+EnvironmentFile=/etc/profile.d/db_env.sh
+Environment=ARCHIVE_BUCKET=${ARCHIVE_BUCKET}
+Environment=ARCHIVE_AFTER_DAYS=90
+Environment=ARCHIVE_FORMAT=ndjson
+Environment=ARCHIVE_BATCH_SIZE=5000
+ExecStart=/usr/bin/python3 /opt/chatbot/archive.py
+EOF
+
+cat <<EOF > /etc/systemd/system/chatbot-archive.timer
+[Unit]
+Description=Daily chatbot message archival
+
+[Timer]
+OnCalendar=*-*-* 03:00:00
+RandomizedDelaySec=1h
+Persistent=true
+
+[Install]
+WantedBy=timers.target
+EOF
+
 # Set permissions
 chown -R ec2-user:ec2-user /opt/chatbot
 
@@ -484,6 +1968,10 @@ systemctl start amazon-cloudwatch-agent
 # Start and enable FastAPI service
 systemctl enable chatbot
 systemctl start chatbot
+systemctl enable chatbot-partitions.timer
+systemctl start chatbot-partitions.timer
+systemctl enable chatbot-archive.timer
+systemctl start chatbot-archive.timer
 
 # Configure Nginx
 cat <<EOF > /etc/nginx/conf.d/chatbot.conf
@@ -491,6 +1979,37 @@ server {
     listen 80;
     server_name _;
 
+    # Metrics are scraped on the instance (curl http://127.0.0.1:8000/metrics), not through the ALB
+    location /metrics {
+        deny all;
+    }
+
+    # Server-Sent Events: hand each chunk to the client as soon as gunicorn writes it
+    location /chat/stream {
+        proxy_pass http://127.0.0.1:8000;
+        proxy_http_version 1.1;
+        proxy_set_header Connection "";
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_buffering off;
+        proxy_cache off;
+        proxy_read_timeout 300s;
+    }
+
+    # WebSocket chat: forward the upgrade handshake and keep long-lived connections open
+    location /ws/ {
+        proxy_pass http://127.0.0.1:8000;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade \$http_upgrade;
+        proxy_set_header Connection "upgrade";
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_read_timeout 3600s;
+        proxy_send_timeout 3600s;
+    }
+
     location / {
         proxy_pass http://127.0.0.1:8000;
         proxy_set_header Host \$host;
@@ -0,0 +1,72 @@
+import hashlib
+import json
+
+import pulumi
+import pulumi_aws as aws
+
+# Runs as the instance's user data: fetch the full setup script and hand over to it.
+# The instance profile can take a few seconds to become usable right after boot, hence the retries.
+BOOTSTRAP_TEMPLATE = """#!/bin/bash
+set -e
+for attempt in 1 2 3 4 5 6 7 8 9 10; do
+    aws s3 cp "s3://{bucket}/{key}" /var/lib/cloud/chatbot-user-data.sh --region {region} && break
+    sleep 6
+done
+exec bash /var/lib/cloud/chatbot-user-data.sh
+"""
+
+def create_user_data_bootstrap(name, script):
+    """
+    EC2 caps user data at 16 KB, even gzipped. The full setup script (user_data.sh) is stored
+    in S3 instead, and the instances get a few lines of user data that download and run it.
+    The object key contains the script's hash, so a changed script also changes the bootstrap
+    and the launch template picks it up.
+    """
+    bucket = aws.s3.BucketV2(
+        f"{name}-bootstrap",
+        bucket_prefix=f"{name}-bootstrap-",
+        force_destroy=True,  # Only holds generated scripts
+        tags={"Name": f"{name}-bootstrap"},
+    )
+
+    aws.s3.BucketPublicAccessBlock(
+        f"{name}-bootstrap-public-access",
+        bucket=bucket.id,
+        block_public_acls=True,
+        block_public_policy=True,
+        ignore_public_acls=True,
+        restrict_public_buckets=True,
+    )
+
+    script_object = aws.s3.BucketObjectv2(
+        f"{name}-user-data-script",
+        bucket=bucket.id,
+        key=script.apply(lambda data: f"user_data/{hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]}.sh"),
+        content=script,
+        content_type="text/x-shellscript",
+        server_side_encryption="AES256",
+    )
+
+    # Read-only access to the scripts for the instances
+    policy = aws.iam.Policy(
+        f"{name}-bootstrap-policy",
+        policy=bucket.arn.apply(lambda arn: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Effect": "Allow",
+                "Action": ["s3:GetObject"],
+                "Resource": f"{arn}/user_data/*",
+            }],
+        })),
+    )
+
+    user_data = pulumi.Output.all(bucket.bucket, script_object.key).apply(
+        lambda args: BOOTSTRAP_TEMPLATE.format(bucket=args[0], key=args[1], region=aws.config.region)
+    )
+
+    return {
+        "bucket": bucket,
+        "object": script_object,
+        "policy": policy,
+        "user_data": user_data,
+    }
@@ -8,10 +8,17 @@
 # debugpy.wait_for_client()
 # print("✅ Debugger attached, continuing execution.")
 
+import os
+import sys
+
 import pulumi
 import pulumi_aws as aws
 from pulumi_aws import ec2
 
+# Modules shared by the Pulumi programs in this repo (pulumi_shared/ at the repo root)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pulumi_shared.ami import UBUNTU_JAMMY, get_ami_id, get_ami_ids
+
 ## --- Get the current AWS region
 region = aws.get_region()
 pulumi.export("region", region.name)
@@ -24,29 +31,9 @@ pulumi.export("region", region.name)
 #   --query "Parameter.Value" \
 #   --output text
 
-## Approach #1
-async def get_amazon_linux_amis():
-    # Define the filters for Amazon Linux AMIs
-    filters = [
-        {"name": "name", "values": ["amzn2-ami-hvm-*"]},  # Filter for Amazon Linux AMIs
-        {"name": "state", "values": ["available"]},  # Only available AMIs
-        {"name": "root-device-type", "values": ["ebs"]}  # EBS-backed AMIs
-    ]
-
-    # Use the get_ami_ids function to get the list of AMI IDs
-    result = await aws.ec2.get_ami_ids(
-        filters=filters,
-        owners=["amazon"],  # AMIs owned by Amazon
-    )
-
-    return result.ids
-
-# Get the list of Amazon Linux AMIs and export it
-ami_ids = pulumi.Output.from_input(get_amazon_linux_amis())
-# ami_ids.apply(lambda ids: print("Amazon Linux AMI IDs:", ids))
-
-
-## Approach #2
+## Approach #1 awaited aws.ec2.get_ami_ids in an async function and Approach #2 called it
+## synchronously, so every run made the same lookup twice. The shared resolver makes it once,
+## with the async get_ami_ids_output form, and pins the result in ami.lock.json (see pulumi_shared/ami.py).
 filters = [
         {
             "name": "name", 
@@ -61,19 +48,18 @@ filters = [
             "values": ["ebs"]
         }  # EBS-backed AMIs
     ]
-result = aws.ec2.get_ami_ids(
-        filters=filters,
+ami_ids = get_ami_ids(
         owners=["amazon"],  # AMIs owned by Amazon
+        filters=filters,
     )
-# pulumi.export("Amazon Linux AMI IDs:", result.ids)
+# pulumi.export("Amazon Linux AMI IDs:", ami_ids)
 
 
 
 
 ## --- Dynamically find the latest AMI
 ## Fetch the latest Amazon Linux 2 AMI
-amazon_ami = aws.ec2.get_ami(
-    most_recent=True,
+amazon_ami_id = get_ami_id(
     owners=["amazon"],
     filters=[
         {
@@ -89,20 +75,7 @@ amazon_ami = aws.ec2.get_ami(
 
 
 ## Fetch the latest Ubuntu AMI
-ubuntu_ami = aws.ec2.get_ami_output(
-    most_recent=True,
-    owners=["099720109477"],
-    filters=[
-        {
-            "name": "name",
-            "values": ["ubuntu/images/hvm-ssd/ubuntu-jammy-22.04-amd64-server-*"],
-        },
-        {
-            "name": "virtualization-type",
-            "values": ["hvm"],
-        },
-    ]
-)
+ubuntu_ami_id = get_ami_id(**UBUNTU_JAMMY)
 
 ## Fetch the latest AMI assciated with the user account
 # example = aws.ec2.get_ami(
@@ -126,8 +99,8 @@ ubuntu_ami = aws.ec2.get_ami_output(
 #     ])
 
 
-pulumi.export("ami_id", amazon_ami.id)
-pulumi.export("ami_id_this", ubuntu_ami.id)
+pulumi.export("ami_id", amazon_ami_id)
+pulumi.export("ami_id_this", ubuntu_ami_id)
 
 
 
@@ -163,7 +136,7 @@ instance = ec2.Instance(
     'my-instance',
     instance_type='t2.micro',
     security_groups=[secgroup.name],
-    ami=amazon_ami.id,
+    ami=amazon_ami_id,
     associate_public_ip_address=True,
     key_name='my-keypair' # The key_name refers to an SSH key pair that lets you safely log into your EC2 instance.
     )
\ No newline at end of file
@@ -1,8 +1,15 @@
 """A Python Pulumi program"""
 
+import os
+import sys
+
 import pulumi
 import pulumi_aws as aws
 
+# Modules shared by the Pulumi programs in this repo (pulumi_shared/ at the repo root)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from pulumi_shared.ami import get_ami_id
+
 ## Pulumi coniguration
 # Set my public IP address before running pulumi up
 # pulumi config set --path "trustedCidrs[0]" "$(curl -s https://ipinfo.io/ip)/32"
@@ -15,9 +22,8 @@ app_ports = [22, 80, 443, 8000]       # SSH, HTTP, HTTPS, App Port
 env = "dev"
 project = "project1"
 
-## Fetch the latest Amazon Linux 2 AMI
-amazon_ami = aws.ec2.get_ami(
-    most_recent=True,
+## Fetch the latest Amazon Linux 2 AMI (looked up once and pinned in ami.lock.json, see pulumi_shared/ami.py)
+amazon_ami_id = get_ami_id(
     owners=["amazon"],
     filters=[
         {
@@ -30,7 +36,7 @@ amazon_ami = aws.ec2.get_ami(
         }
     ]
 )
-pulumi.export("ami_id", amazon_ami.id)
+pulumi.export("ami_id", amazon_ami_id)
 
 
 
@@ -174,7 +180,7 @@ sudo systemctl start iptables
 server = aws.ec2.Instance(f"{project}-{env}-fastapi-server",
     instance_type="t2.micro",
     security_groups=[web_secgroup.name],
-    ami=amazon_ami.id,
+    ami=amazon_ami_id,
     associate_public_ip_address=True,
     user_data=user_data_script,
     key_name='my-keypair'
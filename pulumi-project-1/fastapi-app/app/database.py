@@ -1,7 +1,8 @@
 # app/database.py
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 
@@ -13,11 +14,44 @@ DB_USER = os.getenv("DB_USER", "dbadmin")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "password")
 
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-engine = create_engine(DATABASE_URL)
+# Connection pool settings (shared by the sync and async engines).
+# Keep pool_size + max_overflow per worker small enough that all workers fit
+# under the connection limit of the db.t3.micro instance.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds
+
+pool_options = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    pool_recycle=DB_POOL_RECYCLE,
+)
+
+engine = create_engine(DATABASE_URL, **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine: sessions await the database instead of blocking a threadpool thread.
+# Built on first use, so workers that only use the sync engine open no second pool (and never load asyncpg).
+_async_engine = None
+_async_session_factory = None
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options)
+    return _async_engine
+
+def AsyncSessionLocal():
+    global _async_session_factory
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+    return _async_session_factory()
+
 # Database dependency
 def get_db():
     db = SessionLocal()
@@ -26,6 +60,11 @@ def get_db():
     finally:
         db.close()
 
+# Async database dependency (use from `async def` endpoints)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
     
@@ -46,6 +85,23 @@ class Message(Base):
     
     session = relationship("ChatSession", back_populates="messages")
 
+    # Serves one session's history newest first (app/message_queries.py) without a sequential scan
+    __table_args__ = (
+        Index("ix_messages_session_created_id", "session_id", "created_at", "id"),
+    )
+
+def create_indexes(conn):
+    # create_all only adds indexes together with a new table, so add the ones an existing table lacks
+    for index in Message.__table__.indexes:
+        index.create(bind=conn, checkfirst=True)
+
 # Create all tables
 def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        create_indexes(conn)
+
+async def create_tables_async():
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_indexes)
@@ -0,0 +1,56 @@
+# app/history_cache.py
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class HistoryCache:
+    """
+    Small LRU cache of serialized history bodies keyed by session id.
+
+    Each entry remembers the session version it was built from and is only served
+    while that version is still current, so a write from any worker invalidates it.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, version: int) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, session_id: str, version: int, body: bytes):
+        with self._lock:
+            self._entries[session_id] = (version, body)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+
+def make_etag(version: int) -> str:
+    return f'"v{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header (possibly a list or weak validators) against an ETag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
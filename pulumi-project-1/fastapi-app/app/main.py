@@ -1,12 +1,26 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from datetime import datetime
+from typing import List, Optional
+import os
 import random
 
+import orjson
+
+from app.history_cache import HistoryCache, etag_matches, make_etag
+from app.session_backends import create_session_backend
+
 app = FastAPI(title="Chatbot API")
 
-# Simple in-memory storage for chat messages
-chat_history: Dict[str, List[Dict[str, str]]] = {}
+# Chat history storage, selected with SESSION_BACKEND:
+#   memory   - per-worker in-memory store (LRU / idle-TTL eviction, memory budget)
+#   sqlite   - SQLite file in WAL mode shared by all workers on the host
+#   database - ChatSession / Message tables in PostgreSQL (app/database.py)
+chat_history = create_session_backend()
+
+# Serialized /history bodies, served while the session version is unchanged
+history_cache = HistoryCache(max_entries=int(os.getenv("HISTORY_CACHE_ENTRIES", "1024")))
 
 class Message(BaseModel):
     content: str
@@ -20,6 +34,30 @@ class ChatResponse(BaseModel):
     reply: str
     session_id: str
 
+class BatchChatRequest(BaseModel):
+    messages: List[ChatRequest]
+    # Used for messages without their own session_id; a new session is created if neither is set
+    session_id: Optional[str] = None
+
+class BatchChatResponse(BaseModel):
+    replies: List[ChatResponse]
+
+class SessionSummary(BaseModel):
+    session_id: str
+    created_at: datetime
+    updated_at: datetime
+    message_count: int
+    last_message_role: Optional[str] = None
+    last_message_preview: Optional[str] = None
+
+class SessionPage(BaseModel):
+    sessions: List[SessionSummary]
+    # Pass back as `cursor` to fetch the next page; None on the last page
+    next_cursor: Optional[str] = None
+
+# Upper bound on messages per /chat/batch request, so one request cannot hold a transaction open for long
+CHAT_BATCH_MAX_MESSAGES = int(os.getenv("CHAT_BATCH_MAX_MESSAGES", "1000"))
+
 # Simple responses the bot can give
 BOT_RESPONSES = [
     "That's interesting! Tell me more.",
@@ -39,35 +77,127 @@ def chat(request: ChatRequest):
     # Generate a new session ID if none provided
     session_id = request.session_id or f"session_{random.randint(1000, 9999)}"
     
-    # Initialize chat history for new sessions
-    if session_id not in chat_history:
-        chat_history[session_id] = []
-    
-    # Store user message
-    chat_history[session_id].append({
-        "content": request.message,
-        "role": "user"
-    })
-    
     # Generate a simple response
     bot_reply = random.choice(BOT_RESPONSES)
     
-    # Store bot response
-    chat_history[session_id].append({
-        "content": bot_reply,
-        "role": "bot"
-    })
+    # Store user message and bot response together (new sessions are created on first append)
+    chat_history.append_many(session_id, [(request.message, "user"), (bot_reply, "bot")])
+    history_cache.invalidate(session_id)
     
     return ChatResponse(reply=bot_reply, session_id=session_id)
 
 
-@app.get("/history/{session_id}", response_model=List[Message])
-def get_chat_history(session_id: str):
-    if session_id not in chat_history:
+@app.post("/chat/batch", response_model=BatchChatResponse)
+def chat_batch(request: BatchChatRequest):
+    # Replies come back in request order; all turns are stored with one write to the backend
+    if not 1 <= len(request.messages) <= CHAT_BATCH_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=422, detail=f"messages must contain 1 to {CHAT_BATCH_MAX_MESSAGES} items"
+        )
+    default_session_id = request.session_id or f"session_{random.randint(1000, 9999)}"
+
+    replies = []
+    rows = []
+    for item in request.messages:
+        session_id = item.session_id or default_session_id
+        bot_reply = random.choice(BOT_RESPONSES)
+        replies.append(ChatResponse(reply=bot_reply, session_id=session_id))
+        rows.append((session_id, item.message, "user"))
+        rows.append((session_id, bot_reply, "bot"))
+
+    chat_history.append_batch(rows)
+    for session_id in {reply.session_id for reply in replies}:
+        history_cache.invalidate(session_id)
+
+    return BatchChatResponse(replies=replies)
+
+
+def encode_session_cursor(cursor) -> Optional[str]:
+    if cursor is None:
+        return None
+    updated_at, session_id = cursor
+    return f"{updated_at.isoformat()}|{session_id}"
+
+
+def decode_session_cursor(cursor: str):
+    updated_at, sep, session_id = cursor.partition("|")
+    try:
+        if not sep:
+            raise ValueError(cursor)
+        return datetime.fromisoformat(updated_at), session_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@app.get("/sessions", response_model=SessionPage)
+def list_sessions(limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+    # Sessions are ordered by (updated_at, session_id), newest first, and paged with a keyset cursor
+    try:
+        summaries, next_cursor = chat_history.sessions(
+            limit, decode_session_cursor(cursor) if cursor else None
+        )
+    except NotImplementedError:
+        raise HTTPException(status_code=501, detail="Session listing needs SESSION_BACKEND=database")
+    return SessionPage(sessions=summaries, next_cursor=encode_session_cursor(next_cursor))
+
+
+def reply_tokens(reply: str):
+    # Split the canned reply into words, standing in for a model that streams tokens
+    words = reply.split(" ")
+    yield words[0]
+    for word in words[1:]:
+        yield " " + word
+
+
+def sse_event(data, event: Optional[str] = None) -> bytes:
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+@app.post("/chat/stream")
+def chat_stream(request: ChatRequest):
+    # Server-Sent Events: a `session` event, one `data` event per token, then `done` with the full reply
+    session_id = request.session_id or f"session_{random.randint(1000, 9999)}"
+
+    def events():
+        yield sse_event({"session_id": session_id}, event="session")
+        tokens = []
+        for token in reply_tokens(random.choice(BOT_RESPONSES)):
+            tokens.append(token)
+            yield sse_event({"token": token})
+        bot_reply = "".join(tokens)
+        # Persist the turn once, after the reply is complete
+        chat_history.append_many(session_id, [(request.message, "user"), (bot_reply, "bot")])
+        history_cache.invalidate(session_id)
+        yield sse_event({"reply": bot_reply, "session_id": session_id}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# response_model is kept for the OpenAPI schema only. The stored messages are written by /chat and
+# already match Message, so they are returned as a Response, which skips per-item model
+# construction and response_model validation, and are encoded with orjson.
+# Polling clients send the ETag back in If-None-Match and get a 304 while the session is unchanged.
+@app.get("/history/{session_id}", response_model=List[Message], response_class=ORJSONResponse)
+def get_chat_history(session_id: str, request: Request):
+    version = chat_history.version(session_id)
+    if version is None:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    return [Message(content=msg["content"], role=msg["role"]) 
-            for msg in chat_history[session_id]]
+
+    etag = make_etag(version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    body = history_cache.get(session_id, version)
+    if body is None:
+        body = orjson.dumps(chat_history.messages(session_id) or [])
+        history_cache.put(session_id, version, body)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 if __name__ == "__main__":
     import uvicorn
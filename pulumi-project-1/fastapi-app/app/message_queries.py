@@ -0,0 +1,92 @@
+# app/message_queries.py
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.database import ChatSession, Message
+
+# Characters of the last message returned by session_summaries
+PREVIEW_CHARS = 100
+
+# Both queries are written so the (session_id, created_at, id) index answers them directly:
+# an equality on session_id, then a backwards range scan in (created_at, id) order that
+# stops after `n` rows. Ties on created_at (rows inserted in one batch) are broken by id.
+
+
+def latest_messages_query(session_id: str, n: int) -> Select:
+    return (
+        select(Message)
+        .where(Message.session_id == session_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(n)
+    )
+
+
+def messages_before_query(session_id: str, cursor: int, n: int) -> Select:
+    cursor_created_at = select(Message.created_at).where(Message.id == cursor).scalar_subquery()
+    return (
+        select(Message)
+        .where(
+            Message.session_id == session_id,
+            tuple_(Message.created_at, Message.id) < tuple_(cursor_created_at, cursor),
+        )
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(n)
+    )
+
+
+def latest_messages(db: Session, session_id: str, n: int) -> List[Message]:
+    """Return the newest `n` messages of a session, oldest first."""
+    return list(reversed(db.scalars(latest_messages_query(session_id, n)).all()))
+
+
+def messages_before(db: Session, session_id: str, cursor: int, n: int) -> List[Message]:
+    """
+    Return up to `n` messages of a session that precede the message with id `cursor`,
+    oldest first. Pass the id of the first message of a page to fetch the page before it.
+    """
+    return list(reversed(db.scalars(messages_before_query(session_id, cursor, n)).all()))
+
+
+def session_summaries_query(limit: int, cursor: Optional[Tuple[datetime, str]] = None) -> Select:
+    """
+    One statement for a page of sessions, most recently updated first, with message counts and
+    a preview of each session's last message. The counts are aggregated only over the sessions
+    on the page, and the last message is joined by id, so the cost does not depend on how many
+    sessions exist and nothing is loaded lazily per session.
+    """
+    page = select(ChatSession.id, ChatSession.created_at, ChatSession.updated_at)
+    if cursor is not None:
+        page = page.where(tuple_(ChatSession.updated_at, ChatSession.id) < tuple_(*cursor))
+    page = page.order_by(ChatSession.updated_at.desc(), ChatSession.id.desc()).limit(limit).subquery("page")
+
+    stats = (
+        select(
+            Message.session_id,
+            func.count(Message.id).label("message_count"),
+            func.max(Message.id).label("last_message_id"),
+        )
+        .join(page, Message.session_id == page.c.id)
+        .group_by(Message.session_id)
+        .subquery("stats")
+    )
+    return (
+        select(
+            page.c.id,
+            page.c.created_at,
+            page.c.updated_at,
+            func.coalesce(stats.c.message_count, 0).label("message_count"),
+            Message.role.label("last_message_role"),
+            func.substr(Message.content, 1, PREVIEW_CHARS).label("last_message_preview"),
+        )
+        .outerjoin(stats, stats.c.session_id == page.c.id)
+        .outerjoin(Message, Message.id == stats.c.last_message_id)
+        .order_by(page.c.updated_at.desc(), page.c.id.desc())
+    )
+
+
+def session_summaries(db: Session, limit: int, cursor: Optional[Tuple[datetime, str]] = None):
+    """Return a page of session summary rows; pass (updated_at, id) of the last row to get the next page."""
+    return db.execute(session_summaries_query(limit, cursor)).all()
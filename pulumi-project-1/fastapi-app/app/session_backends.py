@@ -0,0 +1,257 @@
+# app/session_backends.py
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.session_store import SessionStore
+
+
+class SessionBackend(ABC):
+    """
+    Storage for chat sessions.
+
+    The in-process backend is private to each worker. With more than one worker
+    (gunicorn -w N) use the sqlite (one host) or database (all hosts) backend so
+    every worker sees the same history.
+    """
+
+    @abstractmethod
+    def append_many(self, session_id: str, items: Iterable[Tuple[str, str]]):
+        """Append (content, role) pairs to a session, creating it if needed."""
+
+    @abstractmethod
+    def messages(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """Return the session's messages oldest first, or None if the session is unknown."""
+
+    @abstractmethod
+    def version(self, session_id: str) -> Optional[int]:
+        """
+        Return a number that increases with every write to the session, or None if the
+        session is unknown. Every worker sees the same value for the shared backends.
+        """
+
+    def append(self, session_id: str, content: str, role: str):
+        self.append_many(session_id, [(content, role)])
+
+    def sessions(self, limit: int, cursor: Optional[Tuple[datetime, str]] = None):
+        """
+        Return (summaries, next_cursor) for up to `limit` sessions, most recently updated first.
+        Each summary has session_id, created_at, updated_at, message_count, last_message_role and
+        last_message_preview; next_cursor is None on the last page. Only the database backend
+        keeps the timestamps this needs.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot list sessions")
+
+    def append_batch(self, rows: Iterable[Tuple[str, str, str]]):
+        """
+        Append (session_id, content, role) rows that may span several sessions.
+
+        The shared backends override this to write every row in one transaction.
+        """
+        grouped: Dict[str, List[Tuple[str, str]]] = {}
+        for session_id, content, role in rows:
+            grouped.setdefault(session_id, []).append((content, role))
+        for session_id, items in grouped.items():
+            self.append_many(session_id, items)
+
+
+class InProcessSessionBackend(SessionBackend):
+    def __init__(self, store: SessionStore):
+        self.store = store
+
+    def append_many(self, session_id, items):
+        for content, role in items:
+            self.store.append(session_id, content, role)
+
+    def messages(self, session_id):
+        return self.store.messages(session_id)
+
+    def version(self, session_id):
+        return self.store.version(session_id)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Sessions in a local SQLite file in WAL mode, shared by all workers on the host.
+
+    WAL lets readers run alongside the single writer. Each thread keeps its own
+    connection because sqlite3 connections must not be shared across threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " role TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_messages_session_id ON messages (session_id, id)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def append_many(self, session_id, items):
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO messages (session_id, content, role) VALUES (?, ?, ?)",
+                [(session_id, content, role) for content, role in items],
+            )
+
+    def append_batch(self, rows):
+        with self._connection() as conn:
+            conn.executemany("INSERT INTO messages (session_id, content, role) VALUES (?, ?, ?)", list(rows))
+
+    def messages(self, session_id):
+        rows = self._connection().execute(
+            "SELECT content, role FROM messages WHERE session_id = ? ORDER BY id", (session_id,)
+        ).fetchall()
+        if not rows:
+            return None
+        return [{"content": content, "role": role} for content, role in rows]
+
+    def version(self, session_id):
+        # Ids only grow, so the newest message id doubles as the session version
+        (version,) = self._connection().execute(
+            "SELECT max(id) FROM messages WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return version
+
+
+class DatabaseSessionBackend(SessionBackend):
+    """Sessions in the ChatSession / Message tables from app.database (PostgreSQL)."""
+
+    def __init__(self):
+        from app import database
+
+        self.db = database
+        database.create_tables()
+
+    def _touch_sessions(self, db, session_ids):
+        """
+        Create the sessions that do not exist yet and set updated_at on all of them, in db's transaction.
+
+        One INSERT ... ON CONFLICT statement, so two workers writing the first message of the same
+        session cannot both try to create it. Ids are sorted so that concurrent batches lock the
+        session rows in the same order.
+        """
+        now = datetime.utcnow()
+        statement = pg_insert(self.db.ChatSession).values(
+            [{"id": session_id, "created_at": now, "updated_at": now} for session_id in sorted(session_ids)]
+        )
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[self.db.ChatSession.id],
+            set_={"updated_at": statement.excluded.updated_at},
+        ))
+
+    def append_many(self, session_id, items):
+        db = self.db.SessionLocal()
+        try:
+            # New messages do not dirty the session row, so updated_at is set explicitly
+            self._touch_sessions(db, [session_id])
+            db.add_all(
+                self.db.Message(session_id=session_id, content=content, role=role)
+                for content, role in items
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def append_batch(self, rows):
+        rows = [{"session_id": session_id, "content": content, "role": role} for session_id, content, role in rows]
+        if not rows:
+            return
+        db = self.db.SessionLocal()
+        try:
+            self._touch_sessions(db, {row["session_id"] for row in rows})
+            # A list of parameter sets is sent as multi-row INSERT ... VALUES statements
+            db.execute(insert(self.db.Message), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def messages(self, session_id):
+        db = self.db.SessionLocal()
+        try:
+            if db.get(self.db.ChatSession, session_id) is None:
+                return None
+            rows = (
+                db.query(self.db.Message.content, self.db.Message.role)
+                .filter(self.db.Message.session_id == session_id)
+                .order_by(self.db.Message.created_at, self.db.Message.id)
+                .all()
+            )
+            return [{"content": content, "role": role} for content, role in rows]
+        finally:
+            db.close()
+
+    def sessions(self, limit, cursor=None):
+        from app.message_queries import session_summaries
+
+        db = self.db.SessionLocal()
+        try:
+            rows = session_summaries(db, limit, cursor)
+        finally:
+            db.close()
+        summaries = [
+            {
+                "session_id": row.id,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+                "message_count": row.message_count,
+                "last_message_role": row.last_message_role,
+                "last_message_preview": row.last_message_preview,
+            }
+            for row in rows
+        ]
+        next_cursor = (rows[-1].updated_at, rows[-1].id) if len(rows) == limit else None
+        return summaries, next_cursor
+
+    def version(self, session_id):
+        # Ids only grow, so the newest message id doubles as the session version
+        db = self.db.SessionLocal()
+        try:
+            return (
+                db.query(func.max(self.db.Message.id))
+                .filter(self.db.Message.session_id == session_id)
+                .scalar()
+            )
+        finally:
+            db.close()
+
+
+def create_session_backend(name: Optional[str] = None) -> SessionBackend:
+    """Build the backend named by `name` or SESSION_BACKEND: memory, sqlite or database."""
+    name = name or os.getenv("SESSION_BACKEND", "memory")
+    if name == "memory":
+        return InProcessSessionBackend(SessionStore(
+            max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+            idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "3600")),
+            memory_budget=int(os.getenv("SESSION_MEMORY_BUDGET_MB", "64")) * 1024 * 1024,
+        ))
+    if name == "sqlite":
+        return SQLiteSessionBackend(os.getenv("SESSION_SQLITE_PATH", "/tmp/chat_sessions.db"))
+    if name == "database":
+        return DatabaseSessionBackend()
+    raise ValueError(f"Unknown SESSION_BACKEND: {name}")
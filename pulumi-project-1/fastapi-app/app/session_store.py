@@ -0,0 +1,164 @@
+# app/session_store.py
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# Approximate per-message overhead on top of the content string itself:
+# one list slot for the content plus one byte for the role code.
+MESSAGE_OVERHEAD_BYTES = 9
+SESSION_OVERHEAD_BYTES = 256
+
+
+class SessionHistory:
+    """
+    Messages of one chat session stored column-wise.
+
+    Contents live in a plain list and roles in a bytearray of codes that index
+    the store's interned role table, so a message costs its string plus ~9 bytes
+    instead of a two-key dict (~200 bytes).
+    """
+
+    __slots__ = ("contents", "roles", "last_access", "nbytes", "version")
+
+    def __init__(self, now: float):
+        self.contents: List[str] = []
+        self.roles = bytearray()
+        self.last_access = now
+        self.nbytes = SESSION_OVERHEAD_BYTES
+        self.version = 0
+
+    def __len__(self):
+        return len(self.contents)
+
+
+class SessionStore:
+    """
+    In-memory chat sessions with LRU and idle-TTL eviction.
+
+    Sessions are kept in access order. Idle sessions are dropped once they exceed
+    `idle_ttl` seconds, and the least recently used sessions are dropped while there
+    are more than `max_sessions` or the approximate size exceeds `memory_budget`
+    bytes. A session that alone exceeds `memory_budget` loses its oldest messages
+    (the newest one is always kept).
+    """
+
+    def __init__(self, max_sessions: int = 10000, idle_ttl: float = 3600,
+                 memory_budget: int = 64 * 1024 * 1024, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.memory_budget = memory_budget
+        self.clock = clock
+        self.nbytes = 0
+        self.evictions = 0
+        self.trimmed_messages = 0
+        # Store-wide write counter; a session's version is the counter value of its last write,
+        # so a session that is evicted and recreated never repeats an earlier version
+        self._writes = 0
+        self._sessions: "OrderedDict[str, SessionHistory]" = OrderedDict()
+        self._role_codes: Dict[str, int] = {}
+        self._role_names: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str):
+        with self._lock:
+            return self._touch(session_id, self.clock()) is not None
+
+    def append(self, session_id: str, content: str, role: str):
+        with self._lock:
+            now = self.clock()
+            session = self._touch(session_id, now)
+            if session is None:
+                session = self._sessions[session_id] = SessionHistory(now)
+                self.nbytes += session.nbytes
+            size = sys.getsizeof(content) + MESSAGE_OVERHEAD_BYTES
+            session.contents.append(content)
+            session.roles.append(self._role_code(role))
+            session.nbytes += size
+            self.nbytes += size
+            self._writes += 1
+            session.version = self._writes
+            self._evict(now, keep=session_id)
+
+    def messages(self, session_id: str) -> Optional[List[Dict[str, str]]]:
+        """Return the session's messages as dicts, or None if it is unknown or expired."""
+        with self._lock:
+            session = self._touch(session_id, self.clock())
+            if session is None:
+                return None
+            names = self._role_names
+            return [{"content": content, "role": names[code]}
+                    for content, code in zip(session.contents, session.roles)]
+
+    def version(self, session_id: str) -> Optional[int]:
+        """Return a number that changes on every write to the session, or None if it is unknown."""
+        with self._lock:
+            session = self._touch(session_id, self.clock())
+            return None if session is None else session.version
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "approx_bytes": self.nbytes,
+            "memory_budget": self.memory_budget,
+            "evictions": self.evictions,
+            "trimmed_messages": self.trimmed_messages,
+        }
+
+    def _role_code(self, role: str) -> int:
+        code = self._role_codes.get(role)
+        if code is None:
+            if len(self._role_names) == 256:
+                raise ValueError("too many distinct roles")
+            role = sys.intern(role)
+            code = self._role_codes[role] = len(self._role_names)
+            self._role_names.append(role)
+        return code
+
+    def _touch(self, session_id: str, now: float) -> Optional[SessionHistory]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if now - session.last_access > self.idle_ttl:
+            self._drop(session_id)
+            return None
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self.nbytes -= session.nbytes
+        self.evictions += 1
+
+    def _evict(self, now: float, keep: str):
+        # The front of the OrderedDict is the least recently used session
+        while self._sessions:
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if oldest_id == keep:
+                break
+            expired = now - oldest.last_access > self.idle_ttl
+            over_budget = len(self._sessions) > self.max_sessions or self.nbytes > self.memory_budget
+            if not (expired or over_budget):
+                break
+            self._drop(oldest_id)
+        # Still over budget means the session being written is the only one left
+        if self.nbytes > self.memory_budget and keep in self._sessions:
+            self._trim(self._sessions[keep])
+
+    def _trim(self, session: SessionHistory):
+        # Drop the oldest messages until the store fits the budget, keeping the newest message
+        excess = self.nbytes - self.memory_budget
+        freed = count = 0
+        while freed < excess and count < len(session.contents) - 1:
+            freed += sys.getsizeof(session.contents[count]) + MESSAGE_OVERHEAD_BYTES
+            count += 1
+        del session.contents[:count]
+        del session.roles[:count]
+        session.nbytes -= freed
+        self.nbytes -= freed
+        self.trimmed_messages += count
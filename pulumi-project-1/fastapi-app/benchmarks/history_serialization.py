@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for GET /history/{session_id}: per-message serialization cost.
+
+Compares the previous implementation (a pydantic Message per stored dict, then
+response_model validation and stdlib json encoding) with the current one
+(stored messages returned through ORJSONResponse with no model validation).
+
+Run from the fastapi-app directory:
+
+    python -m benchmarks.history_serialization --messages 10000 --repeat 20
+"""
+import argparse
+import json
+import statistics
+import time
+from typing import List
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import Message, chat_history
+
+
+def build_legacy_app():
+    legacy = FastAPI()
+
+    @legacy.get("/history/{session_id}", response_model=List[Message])
+    def get_chat_history(session_id: str):
+        messages = chat_history.messages(session_id)
+        if messages is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+
+        return [Message(content=msg["content"], role=msg["role"])
+                for msg in messages]
+
+    return legacy
+
+
+def seed(session_id, count):
+    for i in range(count):
+        chat_history.append(session_id, f"message number {i} with a bit of text", "user" if i % 2 == 0 else "bot")
+
+
+def time_requests(client, path, repeat):
+    client.get(path)  # warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path)
+        timings.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    return statistics.median(timings), response.content
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # Measure serialization on every request rather than the cached body
+    main.history_cache.max_entries = 0
+
+    session_id = "bench"
+    seed(session_id, args.messages)
+    path = f"/history/{session_id}"
+
+    before, before_body = time_requests(TestClient(build_legacy_app()), path, args.repeat)
+    after, after_body = time_requests(TestClient(main.app), path, args.repeat)
+
+    assert json.loads(before_body) == json.loads(after_body), "responses differ"
+
+    print(f"messages per session: {args.messages}")
+    for label, seconds in (("before (pydantic + json)", before), ("after (orjson)", after)):
+        print(f"{label:<26} {seconds * 1000:8.2f} ms/request  {seconds / args.messages * 1e6:6.2f} us/message")
+    print(f"speed-up: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,73 @@
+"""
+tracemalloc benchmark for chat history memory use.
+
+Compares the previous storage (Dict[str, List[Dict[str, str]]] with one dict per
+message) with SessionStore (column-wise contents plus interned role codes) and
+reports bytes per message and per session.
+
+Run from the fastapi-app directory:
+
+    python -m benchmarks.session_memory --sessions 2000 --messages 50
+"""
+import argparse
+import gc
+import tracemalloc
+
+from app.session_store import SessionStore
+
+
+def make_messages(sessions, messages):
+    # Content strings are created up front so both layouts are measured without them
+    return [
+        (f"session_{s}", [(f"message {m} of session {s}", "user" if m % 2 == 0 else "bot") for m in range(messages)])
+        for s in range(sessions)
+    ]
+
+
+def fill_legacy(data):
+    history = {}
+    for session_id, items in data:
+        history[session_id] = []
+        for content, role in items:
+            history[session_id].append({"content": content, "role": role})
+    return history
+
+
+def fill_store(data):
+    store = SessionStore(max_sessions=len(data) + 1, memory_budget=1 << 40)
+    for session_id, items in data:
+        for content, role in items:
+            store.append(session_id, content, role)
+    return store
+
+
+def measure(fill, data):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    container = fill(data)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del container
+    return used
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=50, help="messages per session")
+    args = parser.parse_args()
+
+    data = make_messages(args.sessions, args.messages)
+    total = args.sessions * args.messages
+    print(f"{args.sessions} sessions x {args.messages} messages (content strings excluded)")
+    results = {}
+    for label, fill in (("dict per message", fill_legacy), ("SessionStore", fill_store)):
+        used = results[label] = measure(fill, data)
+        print(f"{label:<18} {used / 1024 / 1024:8.2f} MiB  {used / total:7.1f} B/message  {used / args.sessions:9.1f} B/session")
+    print(f"reduction: {results['dict per message'] / results['SessionStore']:.1f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
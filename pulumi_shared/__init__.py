@@ -0,0 +1 @@
+"""Helpers shared by the Pulumi programs in this repo."""
@@ -0,0 +1,120 @@
+"""
+AMI lookups shared by the Pulumi programs in this repo.
+
+aws.ec2.get_ami is a blocking call, and the programs used to make the same lookup several
+times per run (the instance, the launch template, ...). AmiResolver makes each distinct
+lookup once per run with the async get_ami_output / get_ami_ids_output forms, and pins the
+answers in a lockfile next to the program, so later previews skip the API calls and keep
+launching the same image until the pin expires.
+
+Stack config (all optional):
+    ami:lockfile   path of the lockfile, relative to the program (default ami.lock.json, "" to disable)
+    ami:ttlHours   how long a pinned AMI is reused (default 168, one week)
+    ami:refresh    true to ignore the pins and look everything up again
+"""
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import pulumi
+import pulumi_aws as aws
+
+# Latest Amazon Linux 2 (x86_64, gp2 root volume)
+AMAZON_LINUX_2 = {
+    "owners": ["amazon"],
+    "filters": [
+        {"name": "name", "values": ["amzn2-ami-hvm-*-x86_64-gp2"]},
+        {"name": "virtualization-type", "values": ["hvm"]},
+    ],
+}
+
+# Latest Ubuntu 22.04 LTS (amd64) from Canonical
+UBUNTU_JAMMY = {
+    "owners": ["099720109477"],
+    "filters": [
+        {"name": "name", "values": ["ubuntu/images/hvm-ssd/ubuntu-jammy-22.04-amd64-server-*"]},
+        {"name": "virtualization-type", "values": ["hvm"]},
+    ],
+}
+
+
+class AmiResolver:
+    def __init__(self, lockfile="ami.lock.json", ttl=timedelta(days=7), refresh=False, region=None):
+        self.lockfile = lockfile
+        self.ttl = ttl
+        self.refresh = refresh
+        self.region = region
+        self._outputs = {}
+        self._pins = self._read_lockfile()
+
+    def ami(self, owners, filters, most_recent=True, name_regex=None):
+        """ID of the newest AMI matching the filters, as an Output."""
+        args = {"owners": owners, "filters": filters, "most_recent": most_recent, "name_regex": name_regex}
+        return self._resolve("ami", args, lambda: aws.ec2.get_ami_output(**args).id)
+
+    def ami_ids(self, owners, filters, sort_ascending=False):
+        """IDs of every AMI matching the filters, newest first, as an Output."""
+        args = {"owners": owners, "filters": filters, "sort_ascending": sort_ascending}
+        return self._resolve("ami_ids", args, lambda: aws.ec2.get_ami_ids_output(**args).ids)
+
+    def _resolve(self, kind, args, lookup):
+        key = json.dumps(
+            {"kind": kind, "region": self.region or aws.config.region, **args}, sort_keys=True, default=str
+        )
+        if key not in self._outputs:
+            pin = self._pins.get(key)
+            if pin is not None and not self.refresh and not self._expired(pin):
+                self._outputs[key] = pulumi.Output.from_input(pin["value"])
+            else:
+                self._outputs[key] = lookup().apply(lambda value: self._pin(key, value))
+        return self._outputs[key]
+
+    def _expired(self, pin):
+        return datetime.now(timezone.utc) - datetime.fromisoformat(pin["resolved_at"]) > self.ttl
+
+    def _pin(self, key, value):
+        self._pins[key] = {"value": value, "resolved_at": datetime.now(timezone.utc).isoformat()}
+        self._write_lockfile()
+        return value
+
+    def _read_lockfile(self):
+        if not self.lockfile or not os.path.exists(self.lockfile):
+            return {}
+        with open(self.lockfile) as f:
+            return json.load(f)
+
+    def _write_lockfile(self):
+        if not self.lockfile:
+            return
+        # Write to a temporary file and rename it, so an interrupted run never leaves half a lockfile
+        directory = os.path.dirname(os.path.abspath(self.lockfile))
+        with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as f:
+            json.dump(self._pins, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(f.name, self.lockfile)
+
+
+_default_resolver = None
+
+
+def default_resolver():
+    """The resolver for this run, configured from the ami:* stack config."""
+    global _default_resolver
+    if _default_resolver is None:
+        config = pulumi.Config("ami")
+        lockfile = config.get("lockfile")
+        _default_resolver = AmiResolver(
+            lockfile="ami.lock.json" if lockfile is None else lockfile,
+            ttl=timedelta(hours=config.get_float("ttlHours") or 168),
+            refresh=config.get_bool("refresh") or False,
+        )
+    return _default_resolver
+
+
+def get_ami_id(owners, filters, most_recent=True, name_regex=None):
+    return default_resolver().ami(owners, filters, most_recent=most_recent, name_regex=name_regex)
+
+
+def get_ami_ids(owners, filters, sort_ascending=False):
+    return default_resolver().ami_ids(owners, filters, sort_ascending=sort_ascending)
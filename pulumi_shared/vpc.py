@@ -0,0 +1,309 @@
+"""
+VPC builder shared by the Pulumi programs in this repo.
+
+create_vpc spreads one public and one private subnet over each of N availability zones,
+carving their CIDR blocks out of the VPC's block with the ipaddress module instead of
+hard-coded literals. It can give every AZ its own NAT gateway and private route table, so
+egress from a private subnet never crosses into another AZ (no cross-AZ data charges, and
+losing one AZ does not cut the others off).
+"""
+import ipaddress
+
+import pulumi
+import pulumi_aws as aws
+
+NAT_MODES = ("none", "single", "per_az")
+
+# Services the chatbot instances call at boot and all the time after: S3 (bootstrap script,
+# archive), SSM and Session Manager, CloudWatch Logs and metrics (the CloudWatch agent)
+DEFAULT_ENDPOINTS = ("s3", "ssm", "ssmmessages", "logs", "monitoring")
+# Services AWS offers as gateway endpoints (a route-table entry, free); everything else is an
+# interface endpoint (a network interface per AZ, billed by the hour and per GB)
+GATEWAY_SERVICES = ("s3", "dynamodb")
+
+
+def discover_availability_zones(count=None):
+    """Names of the region's available AZs that need no opt-in, in order, at most `count` of them."""
+    zones = aws.get_availability_zones(
+        state="available",
+        filters=[aws.GetAvailabilityZonesFilterArgs(name="opt-in-status", values=["opt-in-not-required"])],
+    ).names
+    if count is not None and count > len(zones):
+        raise ValueError(f"{count} availability zones requested, {aws.config.region} has {len(zones)}")
+    return sorted(zones)[:count]
+
+
+def carve_subnets(cidr_block, zone_count, prefix=24):
+    """
+    Split `cidr_block` into (public, private) CIDR lists of `zone_count` blocks each.
+
+    Every AZ index has a fixed pair of blocks, so adding AZs never moves an existing subnet (a
+    subnet whose CIDR changes is replaced, and the replacement cannot be created while another
+    subnet still holds that block). Block 0 is left unused. The first two AZs keep the layout
+    these programs have always used, public blocks 1 and 2 and private blocks 3 and 4 (10.0.1.0/24
+    to 10.0.4.0/24 in 10.0.0.0/16); each further AZ takes the next free pair, public then private
+    (10.0.5.0/24 and 10.0.6.0/24 for the third).
+    """
+    network = ipaddress.ip_network(cidr_block)
+    available = 2 ** (prefix - network.prefixlen)
+    block_size = 2 ** (network.max_prefixlen - prefix)
+
+    def block(index):
+        return str(ipaddress.ip_network((int(network.network_address) + index * block_size, prefix)))
+
+    pairs = [(1 + index, 3 + index) if index < 2 else (2 * index + 1, 2 * index + 2) for index in range(zone_count)]
+    needed = max((private for _, private in pairs), default=0) + 1
+    if needed > available:
+        raise ValueError(f"{cidr_block} has room for {available} /{prefix} subnets, {needed} needed")
+    return [block(public) for public, _ in pairs], [block(private) for _, private in pairs]
+
+
+def create_vpc(name, cidr_block="10.0.0.0/16", az_count=2, availability_zones=None, nat_gateways="none",
+               subnet_prefix=24, endpoints=(), tags=None, legacy_names=None):
+    """
+    Create a VPC with a public and a private subnet in each availability zone.
+
+    availability_zones: AZ names to use; by default the first `az_count` available AZs of the region.
+    nat_gateways: "none" (private subnets have no internet egress), "single" (one NAT gateway
+        in the first AZ shared by every private subnet, the cheapest) or "per_az" (one NAT
+        gateway and private route table per AZ, egress stays in-AZ).
+    endpoints: services to reach through VPC endpoints instead of the internet or a NAT
+        gateway, e.g. DEFAULT_ENDPOINTS (see create_vpc_endpoints).
+    tags: extra tags for every resource, next to Name.
+    legacy_names: {builder name: name a stack already uses for that resource}, e.g.
+        {"chatbot-public-subnet-a": "public-subnet-a"}. Each becomes a pulumi.Alias, so a program
+        that moves onto create_vpc adopts its existing resources instead of replacing them (a
+        replacement subnet with the same CIDR block cannot be created next to the old one).
+
+    Returns a dict with the vpc, the public and private subnets (in AZ order), the NAT
+    gateways, the route tables, the VPC endpoints by service and the AZ names.
+    """
+    if nat_gateways not in NAT_MODES:
+        raise ValueError(f"nat_gateways must be one of {', '.join(NAT_MODES)}, not {nat_gateways!r}")
+    zones = list(availability_zones) if availability_zones else discover_availability_zones(az_count)
+    public_cidrs, private_cidrs = carve_subnets(cidr_block, len(zones), subnet_prefix)
+    extra_tags = tags or {}
+    legacy_names = legacy_names or {}
+
+    def tagged(resource_name):
+        return {"Name": resource_name, **extra_tags}
+
+    def opts(resource_name, previous_names=(), **kwargs):
+        # Earlier names of the resource, and the names the calling program gave it before create_vpc
+        names = list(previous_names) + [legacy_names[n] for n in (resource_name, *previous_names) if n in legacy_names]
+        return pulumi.ResourceOptions(aliases=[pulumi.Alias(name=n) for n in names], **kwargs)
+
+    """
+    10.0.0.0/16 means:
+        -- The VPC can contain up to 65,536 IP addresses (from 10.0.0.0 to 10.0.255.255).
+        -- This is a large private IP range, suitable for subdividing into subnets later.
+
+    ** enable_dns_hostnames=True
+        -- This tells AWS to enable DNS hostnames for instances launched in this VPC.
+        -- If this is True, instances will get public DNS hostnames if they have public IPs (or private DNS names if private).
+
+    ** enable_dns_support=True,
+        -- This allows instances in the VPC to resolve AWS-provided DNS names.
+        -- This is required if you want instances to resolve domain names, e.g., to reach AWS services or external services via DNS.
+
+    If DNS is disabled, your servers inside the VPC won’t be able to use domain names — only IP addresses.
+    """
+    vpc = aws.ec2.Vpc(
+        f"{name}-vpc",
+        cidr_block=cidr_block,
+        enable_dns_hostnames=True,
+        enable_dns_support=True,
+        tags=tagged(f"{name}-vpc"),
+        opts=opts(f"{name}-vpc"),
+    )
+
+    """
+    An Internet Gateway (IGW) is like the bridge between your private AWS VPC and the public internet.
+    Without an Internet Gateway, anything inside your VPC (EC2 instances, containers, etc.):
+        🚫 Cannot access the internet (no downloads, no updates, no calling external APIs)
+        🚫 Cannot be accessed from the internet (no incoming HTTP traffic, no ssh)
+    """
+    igw = aws.ec2.InternetGateway(
+        f"{name}-igw",
+        vpc_id=vpc.id,
+        tags=tagged(f"{name}-igw"),
+        opts=opts(f"{name}-igw"),
+    )
+
+    """
+    A route table is like a set of rules for traffic routing → it tells AWS where traffic should go when leaving a subnet.
+        cidr_block="0.0.0.0/0" → means "all traffic to any IP address in the world".
+        gateway_id=igw.id → means "send that traffic to the Internet Gateway".
+    Without this route: 🚫 Even with map_public_ip_on_launch=True, your instances would NOT be able to talk to the internet.
+    """
+    public_rt = aws.ec2.RouteTable(
+        f"{name}-public-rt",
+        vpc_id=vpc.id,
+        routes=[
+            aws.ec2.RouteTableRouteArgs(
+                cidr_block="0.0.0.0/0",
+                gateway_id=igw.id,
+            ),
+        ],
+        tags=tagged(f"{name}-public-rt"),
+        opts=opts(f"{name}-public-rt"),
+    )
+
+    """
+    map_public_ip_on_launch=True makes a subnet public: instances launched in it get a public IP
+    address, which (with the route to the IGW above) allows incoming and outgoing internet traffic.
+    Private subnets only give out private IPs → no internet access without a NAT gateway.
+
+    Each subnet is named after its AZ's letter, e.g. chatbot-public-subnet-a in eu-west-2a.
+    """
+    public_subnets, private_subnets = [], []
+    for zone, public_cidr, private_cidr in zip(zones, public_cidrs, private_cidrs):
+        suffix = zone[-1]
+        public_subnet = aws.ec2.Subnet(
+            f"{name}-public-subnet-{suffix}",
+            vpc_id=vpc.id,
+            cidr_block=public_cidr,
+            availability_zone=zone,
+            map_public_ip_on_launch=True,
+            tags=tagged(f"{name}-public-subnet-{suffix}"),
+            opts=opts(f"{name}-public-subnet-{suffix}"),
+        )
+        aws.ec2.RouteTableAssociation(
+            f"{name}-public-rta-{suffix}",
+            subnet_id=public_subnet.id,
+            route_table_id=public_rt.id,
+            opts=opts(f"{name}-public-rta-{suffix}"),
+        )
+        public_subnets.append(public_subnet)
+        private_subnets.append(aws.ec2.Subnet(
+            f"{name}-private-subnet-{suffix}",
+            vpc_id=vpc.id,
+            cidr_block=private_cidr,
+            availability_zone=zone,
+            tags=tagged(f"{name}-private-subnet-{suffix}"),
+            opts=opts(f"{name}-private-subnet-{suffix}"),
+        ))
+
+    """
+    A NAT Gateway allows private instances (in private subnets) to:
+        ✅ Initiate outbound connections to the internet (e.g., download packages, call APIs, update OS).
+        🚫 BUT it blocks inbound connections from the internet.
+    It needs an Elastic IP (a static public IP) and lives in a public subnet, because it reaches
+    the internet through the IGW. Private subnets route 0.0.0.0/0 to it through their route table.
+    """
+    nat_gateway_list, private_route_tables = [], []
+    if nat_gateways != "none":
+        nat_zones = public_subnets[:1] if nat_gateways == "single" else public_subnets
+        for index, public_subnet in enumerate(nat_zones):
+            # "single" keeps the original unsuffixed names; per-AZ names carry the AZ letter,
+            # and the first AZ's resources keep their identity from the single-NAT layout
+            suffix = "" if nat_gateways == "single" else f"-{zones[index][-1]}"
+            def single_nat_name(resource_name):
+                return [resource_name] if suffix and index == 0 else []
+
+            eip = aws.ec2.Eip(
+                f"{name}-nat-eip{suffix}",
+                domain="vpc",
+                tags=tagged(f"{name}-nat-eip{suffix}"),
+                opts=opts(f"{name}-nat-eip{suffix}", single_nat_name(f"{name}-nat-eip")),
+            )
+            nat_gateway = aws.ec2.NatGateway(
+                f"{name}-nat-gateway{suffix}",
+                allocation_id=eip.id,
+                subnet_id=public_subnet.id,
+                tags=tagged(f"{name}-nat-gateway{suffix}"),
+                opts=opts(f"{name}-nat-gateway{suffix}", single_nat_name(f"{name}-nat-gateway"), depends_on=[igw]),
+            )
+            private_rt = aws.ec2.RouteTable(
+                f"{name}-private-rt{suffix}",
+                vpc_id=vpc.id,
+                routes=[
+                    aws.ec2.RouteTableRouteArgs(
+                        cidr_block="0.0.0.0/0",
+                        nat_gateway_id=nat_gateway.id,
+                    ),
+                ],
+                tags=tagged(f"{name}-private-rt{suffix}"),
+                opts=opts(f"{name}-private-rt{suffix}", single_nat_name(f"{name}-private-rt")),
+            )
+            nat_gateway_list.append(nat_gateway)
+            private_route_tables.append(private_rt)
+
+        for index, (zone, private_subnet) in enumerate(zip(zones, private_subnets)):
+            aws.ec2.RouteTableAssociation(
+                f"{name}-private-rta-{zone[-1]}",
+                subnet_id=private_subnet.id,
+                route_table_id=private_route_tables[0 if nat_gateways == "single" else index].id,
+                opts=opts(f"{name}-private-rta-{zone[-1]}"),
+            )
+
+    route_tables = [public_rt] + private_route_tables
+    # Without NAT the private subnets use the VPC's main route table
+    route_table_ids = [rt.id for rt in route_tables] + ([] if private_route_tables else [vpc.main_route_table_id])
+    vpc_endpoints = create_vpc_endpoints(name, vpc, cidr_block, private_subnets, route_table_ids, endpoints, tagged)
+
+    return {
+        "vpc": vpc,
+        "internet_gateway": igw,
+        "public_subnets": public_subnets,
+        "private_subnets": private_subnets,
+        "nat_gateways": nat_gateway_list,
+        "nat_gateway": nat_gateway_list[0] if nat_gateway_list else None,
+        "public_route_table": public_rt,
+        "private_route_tables": private_route_tables,
+        "endpoints": vpc_endpoints,
+        "availability_zones": zones,
+    }
+
+
+def create_vpc_endpoints(name, vpc, cidr_block, subnets, route_table_ids, services, tagged):
+    """
+    VPC endpoints for `services`. Instances then reach those AWS APIs over the AWS network,
+    without the internet or a NAT gateway: less latency and no NAT data-processing charge.
+
+    Gateway endpoints (S3) add a route to every route table. Interface endpoints get a network
+    interface in each of `subnets` and their own security group, which accepts HTTPS from
+    inside the VPC only. Private DNS makes the usual regional hostnames (e.g.
+    ssm.eu-west-2.amazonaws.com) resolve to those interfaces inside the VPC, so the SDKs, the
+    CLI and the CloudWatch agent use them without any configuration. Without an endpoint
+    policy an endpoint allows every call, and IAM policies apply as before.
+    """
+    vpc_endpoints = {}
+    for service in services:
+        service_name = f"com.amazonaws.{aws.config.region}.{service}"
+        if service in GATEWAY_SERVICES:
+            vpc_endpoints[service] = aws.ec2.VpcEndpoint(
+                f"{name}-{service}-endpoint",
+                vpc_id=vpc.id,
+                service_name=service_name,
+                vpc_endpoint_type="Gateway",
+                route_table_ids=route_table_ids,
+                tags=tagged(f"{name}-{service}-endpoint"),
+            )
+            continue
+
+        endpoint_sg = aws.ec2.SecurityGroup(
+            f"{name}-{service}-endpoint-sg",
+            vpc_id=vpc.id,
+            description=f"HTTPS from the VPC to the {service} endpoint",
+            ingress=[
+                aws.ec2.SecurityGroupIngressArgs(
+                    protocol="tcp",
+                    from_port=443,
+                    to_port=443,
+                    cidr_blocks=[cidr_block],
+                ),
+            ],
+            tags=tagged(f"{name}-{service}-endpoint-sg"),
+        )
+        vpc_endpoints[service] = aws.ec2.VpcEndpoint(
+            f"{name}-{service}-endpoint",
+            vpc_id=vpc.id,
+            service_name=service_name,
+            vpc_endpoint_type="Interface",
+            subnet_ids=[subnet.id for subnet in subnets],
+            security_group_ids=[endpoint_sg.id],
+            private_dns_enabled=True,
+            tags=tagged(f"{name}-{service}-endpoint"),
+        )
+    return vpc_endpoints